@@ -4,10 +4,10 @@ import pytest
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.files.base import File
-from django.db.models.query import QuerySet
 from PIL import Image
 
 from posts.models import Post
+from posts.paginator import CursorPage
 
 
 def get_field_context(context, field_type):
@@ -61,9 +61,9 @@ class TestPostView:
             'содержится поле `text` типа `CharField`'
         )
 
-        comment_context = get_field_context(response.context, QuerySet)
+        comment_context = get_field_context(response.context, CursorPage)
         assert comment_context is not None, (
-            'Проверьте, что передали список комментариев в контекст страницы `/<username>/<post_id>/` типа `QuerySet`'
+            'Проверьте, что передали страницу комментариев в контекст страницы `/<username>/<post_id>/` типа `CursorPage`'
         )
 
 
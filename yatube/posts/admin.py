@@ -1,16 +1,30 @@
 from django.contrib import admin
 
 from .models import Comment, Group, Post
+from .paginator import EstimatedCountPaginator
+from .search import search_posts
 
 EMPTY = '-пусто-'
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    ordering = ('-pub_date',)
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = EMPTY
 
+    def get_search_results(self, request, queryset, search_term):
+        """Search posts by the full-text index instead of LIKE."""
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title')
@@ -20,7 +34,11 @@ class GroupAdmin(admin.ModelAdmin):
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('pk', 'post', 'author', 'created')
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
+    raw_id_fields = ('post', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,192 @@
+"""Read-only JSON API.
+
+Mirrors index, group, profile, post and follow pages. Rows are read
+with values(), so no model instances are created, and pages are
+addressed by ?cursor= tokens (see posts.paginator). ?fields=id,text
+limits fields of posts, the ordering values needed for cursors are
+read anyway. Responses are compact JSON with ETags of the page content
+versions (see posts.caching).
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_safe
+
+from posts import caching
+from posts.models import Comment, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.views import (group_scopes, index_scopes, post_scopes,
+                         profile_scopes)
+
+# Key: lookup.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+AUTHOR_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+
+COMPACT = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """Render data returned by view as compact JSON, errors included."""
+    @require_safe
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        try:
+            data = view(request, *args, **kwargs)
+        except Http404:
+            return error_response('Not found.', HTTPStatus.NOT_FOUND)
+        except ApiError as error:
+            return error_response(str(error), error.status)
+        return JsonResponse(data, json_dumps_params=COMPACT)
+    return inner
+
+
+def error_response(message, status):
+    return JsonResponse({'detail': message}, status=status,
+                        json_dumps_params=COMPACT)
+
+
+def selected_fields(request, fields):
+    """Return fields requested by ?fields=, all by default."""
+    names = request.GET.get('fields')
+    if not names:
+        return fields
+    names = set(names.split(','))
+    unknown = names - set(fields)
+    if unknown:
+        raise ApiError(f'Unknown fields: {", ".join(sorted(unknown))}.')
+    return {key: lookup for key, lookup in fields.items() if key in names}
+
+
+def serialize(row, fields):
+    data = {key: row[lookup] for key, lookup in fields.items()}
+    if 'image' in data:
+        data['image'] = (default_storage.url(data['image'])
+                         if data['image'] else None)
+    return data
+
+
+def get_row(queryset, fields):
+    """Return values() row of the only object of queryset."""
+    row = queryset.values(*fields.values()).first()
+    if row is None:
+        raise Http404
+    return serialize(row, fields)
+
+
+def get_page(request, queryset, fields, ordering=POST_ORDERING):
+    """Return page of queryset rows with links to the next and previous
+    pages."""
+    lookups = dict.fromkeys((*fields.values(),
+                             *(field.lstrip('-') for field in ordering)))
+    paginator = CursorPaginator(queryset.values(*lookups),
+                                settings.POST_PER_PAGE, ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': [serialize(row, fields) for row in page],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+@caching.conditional(index_scopes)
+@api_view
+def index(request):
+    """Return last posts."""
+    return get_page(request, Post.objects.all(),
+                    selected_fields(request, POST_FIELDS))
+
+
+@caching.conditional(group_scopes)
+@api_view
+def group_posts(request, slug):
+    """Return group and its last posts."""
+    group = get_row(Group.objects.filter(slug=slug), GROUP_FIELDS)
+    return {
+        'group': group,
+        **get_page(request, Post.objects.filter(group__slug=slug),
+                   selected_fields(request, POST_FIELDS)),
+    }
+
+
+@caching.conditional(profile_scopes)
+@api_view
+def profile(request, username):
+    """Return author with stats and last posts of the author."""
+    author = get_row(User.objects.filter(username=username), AUTHOR_FIELDS)
+    return {
+        'author': author,
+        **get_page(request, Post.objects.filter(author__username=username),
+                   selected_fields(request, POST_FIELDS)),
+    }
+
+
+@caching.conditional(post_scopes)
+@api_view
+def post_view(request, username, post_id):
+    """Return post and its last comments. ?fields= applies to the post."""
+    post = get_row(Post.objects.filter(author__username=username,
+                                       pk=post_id),
+                   selected_fields(request, POST_FIELDS))
+    return {
+        'post': post,
+        **get_page(request, Comment.objects.filter(post_id=post_id),
+                   COMMENT_FIELDS, COMMENT_ORDERING),
+    }
+
+
+@api_view
+def follow_index(request):
+    """Return last posts of authors followed by request user."""
+    if not request.user.is_authenticated:
+        raise ApiError('Authentication required.', HTTPStatus.UNAUTHORIZED)
+    return get_page(
+        request,
+        Post.objects.filter(timeline_entries__user=request.user),
+        selected_fields(request, POST_FIELDS))
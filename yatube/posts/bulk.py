@@ -0,0 +1,88 @@
+"""Helpers for loading data with bulk_create, which skips save() and
+signals."""
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Case, Value, When
+
+from posts import caching, timeline
+from posts.counters import reconcile_comment_counts, repair_user_stats
+from posts.models import Comment, Group, Post
+
+# Rows per UPDATE restoring dates, 3 parameters each.
+DATES_BATCH_SIZE = 300
+# Ids or (user_id, author_id) pairs per query refreshing inserted rows.
+IDS_BATCH_SIZE = 400
+
+
+def insert(objects, batch_size=None, **kwargs):
+    """bulk_create objects in INSERTs of batch_size rows, capped by
+    the database limit: Django doesn't cap an explicit batch size, and
+    SQLite fails on more than 500 rows or 999 parameters."""
+    model = type(objects[0])
+    limit = max(connection.ops.bulk_batch_size(
+        model._meta.concrete_fields, objects), 1)
+    return model.objects.bulk_create(
+        objects, batch_size=min(batch_size or limit, limit), **kwargs)
+
+
+def insert_dated(objects, date_field, batch_size=None, **kwargs):
+    """Insert objects keeping their values of auto_now_add date_field,
+    which bulk_create replaces with the current time, by restoring them
+    with UPDATE after the insert. Objects need explicit primary keys."""
+    model = type(objects[0])
+    field = model._meta.get_field(date_field)
+    dates = [(obj.pk, getattr(obj, date_field)) for obj in objects]
+    created = insert(objects, batch_size, **kwargs)
+    for start in range(0, len(dates), DATES_BATCH_SIZE):
+        batch = dates[start:start + DATES_BATCH_SIZE]
+        model.objects.filter(pk__in=[pk for pk, _ in batch]).update(**{
+            date_field: Case(
+                *(When(pk=pk, then=Value(date, output_field=field))
+                  for pk, date in batch),
+                output_field=field),
+        })
+    for obj, (_, date) in zip(objects, dates):
+        setattr(obj, date_field, date)
+    return created
+
+
+def refresh(posts=(), comments=(), follows=(), user_ids=()):
+    """Restore data maintained by signals after bulk inserts of posts,
+    comments, follows and users: sequences of explicitly set primary
+    keys, timelines, counters and cache versions of the touched scopes.
+    Work depends on the number of inserted rows, not on the tables."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Group, Post, Comment]):
+            cursor.execute(sql)
+    scopes = set()
+    user_ids = set(user_ids)
+    for post in posts:
+        scopes.update(caching.post_scopes(post.author_id, post.group_id))
+        scopes.add(caching.profile_scope(post.author_id))
+        user_ids.add(post.author_id)
+    for batch in _batches([post.pk for post in posts]):
+        timeline.fan_out_posts(batch)
+    pairs = sorted({(follow.user_id, follow.author_id)
+                    for follow in follows})
+    for batch in _batches(pairs):
+        timeline.backfill_follows(batch)
+    for pair in pairs:
+        scopes.update(caching.profile_scope(pk) for pk in pair)
+        user_ids.update(pair)
+    for batch in _batches(sorted({comment.post_id
+                                  for comment in comments})):
+        reconcile_comment_counts(batch)
+        for author_id, group_id in Post.objects.filter(
+                pk__in=batch).values_list('author_id', 'group_id'):
+            scopes.update(caching.post_scopes(author_id, group_id))
+            scopes.add(caching.profile_scope(author_id))
+    for batch in _batches(sorted(user_ids)):
+        repair_user_stats(batch)
+    if scopes:
+        caching.bump_version(*scopes)
+
+
+def _batches(values):
+    for start in range(0, len(values), IDS_BATCH_SIZE):
+        yield values[start:start + IDS_BATCH_SIZE]
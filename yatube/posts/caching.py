@@ -0,0 +1,154 @@
+"""Content versions for fragment cache keys.
+
+Every cached fragment key includes the version of the content it
+shows. Changes of the content bump the version, so fragments can live
+for hours and still never show stale data: old keys are just never
+read again and expire.
+
+Versions are microsecond timestamps rather than incremented counters,
+so a version evicted from the cache is recreated with a fresh value
+and can't collide with keys of older fragments.
+
+Versions are kept in the VERSION_CACHE cache, which must be shared by
+all worker processes: a bump in one worker has to reach the others.
+With a per-process cache (locmem) versions and fragments live only
+PROCESS_CACHE_TIMEOUT seconds and the system check warns.
+
+Pages read from a replica database (see yatube.routers) may miss
+changes which already bumped the version, so their content is neither
+cached nor validated by ETag.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control)
+from django.utils.http import quote_etag
+
+from posts.models import Post
+
+INDEX = 'index'
+VERSION_KEY = 'posts:version:{}'
+PROCESS_CACHE_TIMEOUT = 20
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def profile_scope(user_id):
+    return f'profile:{user_id}'
+
+
+def post_scopes(author_id, *group_ids):
+    """Return scopes of pages which show post of author in groups."""
+    return (INDEX, author_scope(author_id),
+            *(group_scope(pk) for pk in group_ids if pk is not None))
+
+
+def get_version(scope):
+    """Return current content version of scope."""
+    cache = caches[settings.VERSION_CACHE]
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=_version_timeout())
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*scopes):
+    """Invalidate cached fragments of scopes when the current
+    transaction commits, at once outside of transactions. Bumped
+    earlier, a concurrent reader could render the old data and cache it
+    under the new version."""
+    transaction.on_commit(lambda: _set_versions(scopes))
+
+
+def is_shared():
+    """Return True if versions are seen by all worker processes."""
+    return not isinstance(caches[settings.VERSION_CACHE], LocMemCache)
+
+
+def reads_replica():
+    """Return True if posts of this request are read from a replica."""
+    return router.db_for_read(Post) != DEFAULT_DB_ALIAS
+
+
+def fragment_timeout():
+    """Return timeout of page fragments, 0 (not cached) for pages read
+    from a replica."""
+    if reads_replica():
+        return 0
+    if not is_shared():
+        return min(settings.PAGE_CACHE_TIMEOUT, PROCESS_CACHE_TIMEOUT)
+    return settings.PAGE_CACHE_TIMEOUT
+
+
+@checks.register(checks.Tags.caches)
+def check_version_cache(app_configs, **kwargs):
+    if is_shared():
+        return []
+    return [checks.Warning(
+        f'VERSION_CACHE "{settings.VERSION_CACHE}" is local to the '
+        f'process, page caches of other workers are not invalidated.',
+        hint=f'Use a shared cache backend, until then pages are cached '
+             f'for {PROCESS_CACHE_TIMEOUT} seconds.',
+        id='posts.W001',
+    )]
+
+
+def conditional(get_scopes):
+    """Answer 304 Not Modified to GET and HEAD requests when versions
+    of scopes returned by get_scopes(request, *args, **kwargs) did not
+    change since the client's last visit. ETag includes the user, as
+    pages show user specific data. There is no Last-Modified: versions
+    are microseconds and an HTTP date in seconds would answer 304 to
+    a change made later in the same second.
+    get_scopes returns None when the page doesn't exist."""
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or reads_replica():
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            versions = [get_version(scope) for scope in scopes]
+            etag = quote_etag(hashlib.md5(
+                f'{versions}|{request.user.pk}|{request.get_full_path()}'
+                .encode()).hexdigest())
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.setdefault('ETag', etag)
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return inner
+    return decorator
+
+
+def _set_versions(scopes):
+    version = _new_version()
+    caches[settings.VERSION_CACHE].set_many(
+        {VERSION_KEY.format(scope): version for scope in scopes},
+        timeout=_version_timeout())
+
+
+def _version_timeout():
+    return None if is_shared() else PROCESS_CACHE_TIMEOUT
+
+
+def _new_version():
+    return int(time.time() * 1000000)
@@ -0,0 +1,77 @@
+"""Repair of denormalized counters."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+def reconcile_comment_counts(post_ids=None):
+    """Set Post.comment_count to the real number of comments of posts
+    with post_ids, by default of all posts. Return number of fixed
+    posts."""
+    counts = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(count=Count('pk')).values('count')
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    drifted = posts.annotate(
+        real_count=Coalesce(Subquery(counts), 0)
+    ).exclude(comment_count=F('real_count'))
+    fixed = 0
+    for pk, real_count in drifted.values_list('pk', 'real_count').iterator():
+        fixed += Post.objects.filter(pk=pk).update(comment_count=real_count)
+    return fixed
+
+
+def change_user_stats(user_id, **deltas):
+    """Add deltas to UserStats counters of user, e.g. posts_count=1.
+    Counters never go below zero."""
+    UserStats.objects.filter(
+        user_id=user_id,
+        **{f'{field}__gte': -delta
+           for field, delta in deltas.items() if delta < 0}
+    ).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def repair_user_stats(user_ids=None):
+    """Create missing UserStats and fix drifted counters of users with
+    user_ids, by default of all users. Return number of fixed users."""
+    users = User.objects.all()
+    stats = UserStats.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in users.filter(
+            stats__isnull=True).values_list('pk', flat=True).iterator()),
+        ignore_conflicts=True
+    )
+    real = {
+        'followers_count': _count(Follow, 'author'),
+        'following_count': _count(Follow, 'user'),
+        'posts_count': _count(Post, 'author'),
+    }
+    drifted = stats.annotate(
+        **{f'real_{field}': count for field, count in real.items()}
+    ).exclude(
+        followers_count=F('real_followers_count'),
+        following_count=F('real_following_count'),
+        posts_count=F('real_posts_count'),
+    )
+    fields = ['user_id'] + [f'real_{field}' for field in real]
+    fixed = 0
+    for user_id, *counts in drifted.values_list(*fields).iterator():
+        fixed += UserStats.objects.filter(user_id=user_id).update(
+            **dict(zip(real, counts))
+        )
+    return fixed
+
+
+def _count(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('user_id')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), 0)
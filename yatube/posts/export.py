@@ -0,0 +1,99 @@
+"""Streaming export of site data.
+
+Rows are read with values_list() and iterator(chunk_size), so memory
+doesn't depend on the table size. Rows are in import_yatube format:
+users and groups are referenced by username and slug.
+"""
+import json
+import zipfile
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginator import isoformat
+
+CHUNK_SIZE = 2000
+
+# File name: (model, ((key, lookup), ...)).
+EXPORTS = {
+    'groups': (Group, (('slug', 'slug'),
+                       ('title', 'title'),
+                       ('description', 'description'))),
+    'posts': (Post, (('id', 'id'),
+                     ('text', 'text'),
+                     ('author', 'author__username'),
+                     ('group', 'group__slug'),
+                     ('pub_date', 'pub_date'),
+                     ('image', 'image'))),
+    'comments': (Comment, (('id', 'id'),
+                           ('post', 'post_id'),
+                           ('author', 'author__username'),
+                           ('text', 'text'),
+                           ('created', 'created'))),
+    'follows': (Follow, (('user', 'user__username'),
+                         ('author', 'author__username'))),
+}
+
+
+def site_querysets():
+    """Return querysets of the whole site export."""
+    return {name: model.objects.all()
+            for name, (model, fields) in EXPORTS.items()}
+
+
+def user_querysets(user):
+    """Return querysets of posts, comments and follows of the user."""
+    return {
+        'posts': Post.objects.filter(author=user),
+        'comments': Comment.objects.filter(author=user),
+        'follows': Follow.objects.filter(user=user),
+    }
+
+
+def rows(name, queryset, chunk_size=CHUNK_SIZE):
+    """Iterate over export rows of queryset as dicts."""
+    keys, lookups = zip(*EXPORTS[name][1])
+    values = queryset.order_by('pk').values_list(*lookups)
+    for row in values.iterator(chunk_size=chunk_size):
+        yield dict(zip(keys, row))
+
+
+def jsonl(rows):
+    """Iterate over rows as JSON lines."""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, separators=(',', ':'),
+                         default=isoformat) + '\n'
+
+
+def zip_stream(files):
+    """Iterate over bytes of zip archive of files given as (name, lines)
+    pairs. The archive is written to a non-seekable stream, so only
+    the data compressed since the previous chunk is kept in memory."""
+    stream = _Stream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, lines in files:
+            with archive.open(name, 'w') as entry:
+                for line in lines:
+                    entry.write(line.encode())
+                    data = stream.pop()
+                    if data:
+                        yield data
+            yield stream.pop()
+    yield stream.pop()
+
+
+class _Stream:
+    """Write-only file which zipfile can't seek in."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
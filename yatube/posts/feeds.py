@@ -0,0 +1,146 @@
+"""RSS and Atom feeds of the site, groups and authors.
+
+Generated XML is cached under the content versions of the feed scope
+(see posts.caching), so a feed is rendered once per new post in its
+group or from its author and pollers are answered from the cache or
+with 304 Not Modified. Feeds read from a replica are not cached.
+"""
+import hashlib
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from posts import caching
+from posts.models import Group, Post, User
+from posts.views import group_scopes, index_scopes
+
+FEED_ITEMS = 20
+FEED_KEY = 'posts:feed:{}'
+
+
+def author_scopes(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    return (caching.author_scope(author_id),)
+
+
+def cached_feed(feed, get_scopes):
+    """Return view of feed with XML cached under the versions of scopes
+    returned by get_scopes(request, *args, **kwargs) and the host, as
+    links in the feed are absolute."""
+    @caching.conditional(get_scopes)
+    def view(request, *args, **kwargs):
+        scopes = get_scopes(request, *args, **kwargs)
+        if scopes is None:
+            return feed(request, *args, **kwargs)
+        versions = [caching.get_version(scope) for scope in scopes]
+        key = FEED_KEY.format(hashlib.md5(
+            f'{versions}|{request.get_host()}|{request.path}'.encode()
+        ).hexdigest())
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = feed(request, *args, **kwargs)
+        timeout = caching.fragment_timeout()
+        if timeout:
+            cache.set(key, (response.content, response['Content-Type']),
+                      timeout)
+        return response
+    return view
+
+
+class PostsFeed(Feed):
+    title = 'Последние записи Yatube'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return Post.objects.select_related('author')[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return truncatechars(item.text, 60)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post', args=(item.author.username, item.pk))
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+
+class GroupFeed(PostsFeed):
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Записи сообщества {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_posts', args=(group.slug,))
+
+    def items(self, group):
+        return group.posts_group.select_related('author')[:FEED_ITEMS]
+
+
+class AuthorFeed(PostsFeed):
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Записи {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Новые записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def items(self, author):
+        return author.posts_author.select_related('author')[:FEED_ITEMS]
+
+
+class AtomPostsFeed(PostsFeed):
+    feed_type = Atom1Feed
+    subtitle = PostsFeed.description
+
+
+class AtomGroupFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return group.description
+
+
+class AtomAuthorFeed(AuthorFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
+
+
+posts_rss = cached_feed(PostsFeed(), index_scopes)
+posts_atom = cached_feed(AtomPostsFeed(), index_scopes)
+group_rss = cached_feed(GroupFeed(), group_scopes)
+group_atom = cached_feed(AtomGroupFeed(), group_scopes)
+author_rss = cached_feed(AuthorFeed(), author_scopes)
+author_atom = cached_feed(AtomAuthorFeed(), author_scopes)
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
-from posts.models import Comment, Post
+from posts import images
+from posts.models import Comment, Group, Post
 
 
 class PostForm(forms.ModelForm):
@@ -20,6 +22,13 @@ class PostForm(forms.ModelForm):
             'image': 'Выберите картинку для вашей записи',
         }
 
+    def clean_image(self):
+        """Downscale and re-encode new upload with bounded memory."""
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.ingest(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -34,3 +43,15 @@ class CommentForm(forms.ModelForm):
         widgets = {
             'text': forms.Textarea
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200)
+    group = forms.ModelChoiceField(label='Группа',
+                                   queryset=Group.objects.all(),
+                                   to_field_name='slug',
+                                   required=False)
+    author = forms.CharField(label='Автор', max_length=150,
+                             required=False)
+    date_from = forms.DateField(label='С даты', required=False)
+    date_to = forms.DateField(label='По дату', required=False)
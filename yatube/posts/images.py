@@ -0,0 +1,173 @@
+"""Processing of post images.
+
+Uploads are ingested with bounded memory: size is checked from the
+header, oversized JPEGs are decoded at reduced scale (draft), other
+formats in full within the memory budget, and downscaled to
+POST_IMAGE_MAX_SIZE, EXIF is dropped and the image is re-encoded
+before it reaches the storage.
+
+Responsive variants: the original is decoded once, scaled to
+POST_IMAGE_WIDTHS keeping its aspect ratio (the whole image is shown,
+as the post card does) and saved as WebP with JPEG fallback, next to
+the original in <upload_to>/variants/. Callables in variant_observers
+get the duration of every make_variants() call in seconds (used by
+yatube.metrics).
+"""
+import posixpath
+import time
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+INGEST_FORMATS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'GIF': {},
+    'WEBP': {'quality': 90},
+}
+
+# Called with duration of every make_variants() in seconds.
+variant_observers = []
+
+
+def ingest(upload):
+    """Return downscaled and re-encoded copy of uploaded image without
+    EXIF. Peak memory is the decoded pixels plus their downscaled copy.
+    JPEGs are decoded at reduced scale, other formats in full, so
+    ValidationError naming the limit is raised for them if the peak
+    would exceed POST_IMAGE_MAX_DECODE_BYTES. Animated images are
+    rejected, as re-encoding would keep only the first frame, and so
+    are images which fail to decode."""
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое изображение: %(width)sx%(height)s.',
+            code='image_too_large',
+            params={'width': width, 'height': height})
+    if getattr(image, 'is_animated', False):
+        raise ValidationError(
+            'Анимированные изображения не поддерживаются.',
+            code='image_animated')
+    image_format = image.format
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    if image_format == 'JPEG':
+        image.draft(image.mode, max_size)
+    pixel_bytes = _pixel_bytes(image.mode)
+    scaled_width, scaled_height = _fit(image.size, max_size)
+    scaled_bytes = scaled_width * scaled_height * pixel_bytes
+    decoded_bytes = image.size[0] * image.size[1] * pixel_bytes
+    if decoded_bytes + scaled_bytes > settings.POST_IMAGE_MAX_DECODE_BYTES:
+        max_pixels = (settings.POST_IMAGE_MAX_DECODE_BYTES
+                      - scaled_bytes) // pixel_bytes
+        raise ValidationError(
+            'Слишком большое изображение: %(width)sx%(height)s. '
+            'Изображения %(format)s можно загружать размером не более '
+            '%(megapixels).1f Мп.',
+            code='image_too_large',
+            params={'width': width, 'height': height,
+                    'format': image_format,
+                    'megapixels': max(max_pixels, 0) / 1000000})
+    name = upload.name
+    if image_format not in INGEST_FORMATS:
+        image_format = 'PNG'
+        name = posixpath.splitext(name)[0] + '.png'
+    buffer = BytesIO()
+    # Pixels are decoded here, truncated or corrupt data fails only now.
+    try:
+        image.thumbnail(max_size, Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+        image.info.pop('exif', None)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffer, image_format, **INGEST_FORMATS[image_format])
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError(
+            forms.ImageField.default_error_messages['invalid_image'],
+            code='invalid_image')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              Image.MIME.get(image_format))
+
+
+def _fit(size, max_size):
+    """Return size scaled down to fit max_size, as Image.thumbnail."""
+    width, height = size
+    scale = min(1, max_size[0] / width, max_size[1] / height)
+    return round(width * scale), round(height * scale)
+
+
+def _pixel_bytes(mode):
+    """Return bytes per pixel of Pillow image storage for mode."""
+    return {'1': 1, 'L': 1, 'P': 1, 'I;16': 2}.get(mode, 4)
+
+
+def variant_name(image_name, width, ext):
+    """Return storage name of the image variant."""
+    head, tail = posixpath.split(image_name)
+    stem = posixpath.splitext(tail)[0]
+    return posixpath.join(head, 'variants', f'{stem}-{width}.{ext}')
+
+
+def variant_widths(post):
+    """Return widths of ready variants of the post image."""
+    if not post.image or not post.image_widths:
+        return []
+    return [int(width) for width in post.image_widths.split(',')]
+
+
+def make_variants(image):
+    """Save all variants of the image field file.
+    Return list of saved widths, largest first."""
+    started = time.perf_counter()
+    try:
+        return _save_variants(image)
+    finally:
+        duration = time.perf_counter() - started
+        for observer in variant_observers:
+            observer(duration)
+
+
+def _save_variants(image):
+    widths = sorted(settings.POST_IMAGE_WIDTHS, reverse=True)
+    with image.storage.open(image.name, 'rb') as image_file:
+        original = Image.open(image_file)
+        original.draft('RGB', (widths[0], widths[0]))
+        original = _to_rgb(ImageOps.exif_transpose(original))
+        base = original.resize(_scaled_size(original, widths[0]),
+                               Image.LANCZOS)
+    for width in widths:
+        variant = base if width == widths[0] else base.resize(
+            _scaled_size(original, width), Image.LANCZOS)
+        for ext, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            variant.save(buffer, image_format, **options)
+            name = variant_name(image.name, width, ext)
+            image.storage.delete(name)
+            image.storage.save(name, ContentFile(buffer.getvalue()))
+    return widths
+
+
+def _scaled_size(image, width):
+    """Return size of image scaled to width with the same ratio."""
+    return width, max(1, round(image.height * width / image.width))
+
+
+def _to_rgb(image):
+    """Convert image to RGB, transparent areas become white."""
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
@@ -0,0 +1,182 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from posts.management.commands.benchmark_views import percentile
+from posts.models import Post, User
+
+# Pragmas of a plain sqlite3 connection, to compare with.
+BASELINE = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'mmap_size': 0,
+    'cache_size': -2000,
+}
+
+
+class Command(BaseCommand):
+    help = ('Run parallel page reads with new_post and add_comment writes '
+            'on a copy of the database, with default SQLite settings and '
+            'with the configured pragmas, and compare throughput. Caches '
+            'are cleared before each run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Seconds per profile.')
+
+    def handle(self, *args, **options):
+        database = connections.databases['default']
+        if database['ENGINE'] != 'yatube.sqlite':
+            raise CommandError('Default database must use yatube.sqlite.')
+        self.users = list(User.objects.values_list('username', flat=True)[
+            :max(options['writers'], 1)])
+        self.posts = list(Post.objects.values_list(
+            'author__username', 'pk')[:1000])
+        if not self.users or not self.posts:
+            raise CommandError('No posts, run generate_dataset first.')
+        configured = database['OPTIONS'].get('pragmas', {})
+        profiles = (
+            ('baseline', {'pragmas': BASELINE, 'transaction_mode': None},
+             0),
+            ('production', {
+                'pragmas': configured,
+                'transaction_mode': database['OPTIONS'].get(
+                    'transaction_mode')}, database.get('CONN_MAX_AGE', 0)),
+        )
+        directory = tempfile.mkdtemp()
+        original = dict(database)
+        # Workers open their own connections with the changed settings,
+        # the connection of this thread stays on the original database.
+        source = connections['default']
+        source.ensure_connection()
+        results = {}
+        try:
+            for name, profile_options, conn_max_age in profiles:
+                path = os.path.join(directory, f'{name}.sqlite3')
+                target = sqlite3.connect(path)
+                source.connection.backup(target)
+                target.close()
+                database.update({
+                    'NAME': path,
+                    'CONN_MAX_AGE': conn_max_age,
+                    'OPTIONS': {**original['OPTIONS'], **profile_options},
+                })
+                # Each profile starts cold, so the ratio shows the effect
+                # of the settings, not fragments warmed by the previous run.
+                for alias in settings.CACHES:
+                    caches[alias].clear()
+                results[name] = self.run(options)
+                self.report(name, results[name])
+        finally:
+            database.clear()
+            database.update(original)
+            shutil.rmtree(directory, ignore_errors=True)
+        baseline, production = results['baseline'], results['production']
+        self.stdout.write(self.style.SUCCESS(
+            'production/baseline: '
+            f'reads x{_ratio(production["reads"], baseline["reads"])}, '
+            f'writes x{_ratio(production["writes"], baseline["writes"])}'
+        ))
+
+    def run(self, options):
+        deadline = time.monotonic() + options['duration']
+        results = {'read': [], 'write': [], 'errors': 0}
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self.worker,
+                             args=(self.read, None, deadline, results, lock))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=self.worker,
+                             args=(self.write, self.users[
+                                 number % len(self.users)],
+                                 deadline, results, lock))
+            for number in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = options['duration']
+        return {
+            'reads': len(results['read']) / duration,
+            'writes': len(results['write']) / duration,
+            'read_p95_ms': percentile(sorted(results['read']), 95)
+            if results['read'] else None,
+            'write_p95_ms': percentile(sorted(results['write']), 95)
+            if results['write'] else None,
+            'errors': results['errors'],
+        }
+
+    def worker(self, action, username, deadline, results, lock):
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else (
+            'localhost')
+        client = Client(HTTP_HOST=host)
+        if username:
+            client.force_login(User.objects.get(username=username))
+        rng = random.Random()
+        try:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    kind = action(client, rng)
+                except Exception:
+                    with lock:
+                        results['errors'] += 1
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    results[kind].append(elapsed)
+        finally:
+            connections.close_all()
+
+    def read(self, client, rng):
+        username, post_id = rng.choice(self.posts)
+        url = rng.choice((
+            reverse('posts:index'),
+            reverse('posts:profile', args=(username,)),
+            reverse('posts:post', args=(username, post_id)),
+        ))
+        client.get(url)
+        return 'read'
+
+    def write(self, client, rng):
+        username, post_id = rng.choice(self.posts)
+        if rng.random() < 0.5:
+            client.post(reverse('posts:new_post'),
+                        {'text': 'Пост из нагрузочного теста'})
+        else:
+            client.post(reverse('posts:add_comment',
+                                args=(username, post_id)),
+                        {'text': 'Комментарий из нагрузочного теста'})
+        return 'write'
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<11} reads/s {result["reads"]:8.1f}  '
+            f'writes/s {result["writes"]:7.1f}  '
+            f'read p95 {_ms(result["read_p95_ms"])}  '
+            f'write p95 {_ms(result["write_p95_ms"])}  '
+            f'errors {result["errors"]}'
+        )
+
+
+def _ms(value):
+    return 'n/a' if value is None else f'{value:.1f} ms'
+
+
+def _ratio(value, base):
+    return f'{value / base:.2f}' if base else 'n/a'
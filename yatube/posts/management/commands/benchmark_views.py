@@ -0,0 +1,139 @@
+import datetime
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+from yatube.metrics import QueryCounter
+
+
+class Command(BaseCommand):
+    help = ('Request index, group, profile, post and follow pages with '
+            'the test client and report latency percentiles, SQL queries '
+            'and response size.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear cache before every request.')
+        parser.add_argument('--user',
+                            help='Username for the follow page. Default: '
+                                 'user following most authors.')
+        parser.add_argument('--output', help='Save results to JSON file.')
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError('No posts, run generate_dataset first.')
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else (
+            'localhost')
+        anonymous = Client(HTTP_HOST=host)
+        client = Client(HTTP_HOST=host)
+        client.force_login(self.follower(options['user']))
+        results = {}
+        self.stdout.write(f'{"view":<16}{"p50 ms":>9}{"p95 ms":>9}'
+                          f'{"queries":>9}{"bytes":>10}')
+        for name, url, is_private in self.targets():
+            result = self.measure(client if is_private else anonymous,
+                                  url, options)
+            results[name] = result
+            self.stdout.write(
+                f'{name:<16}{result["p50_ms"]:>9.1f}{result["p95_ms"]:>9.1f}'
+                f'{result["queries"]:>9}{result["bytes"]:>10}')
+        if options['output']:
+            report = {'meta': self.meta(options), 'views': results}
+            with open(options['output'], 'w') as target:
+                json.dump(report, target, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Results saved to {options["output"]}.'))
+
+    def follower(self, username):
+        if username:
+            return User.objects.get(username=username)
+        stats = UserStats.objects.select_related('user').order_by(
+            '-following_count').first()
+        if stats is not None:
+            return stats.user
+        return User.objects.order_by('pk').first()
+
+    def targets(self):
+        """Return (name, url, needs login) of measured pages with the
+        biggest group, author and comment thread."""
+        targets = [('index', reverse('posts:index'), False)]
+        num_pages = Paginator(Post.objects.order_by('pk'),
+                              settings.POST_PER_PAGE).num_pages
+        if num_pages > 1:
+            targets.append(('index_middle',
+                            f'{reverse("posts:index")}?page='
+                            f'{num_pages // 2 + 1}', False))
+        group = Group.objects.annotate(
+            posts_count=Count('posts_group')
+        ).order_by('-posts_count').first()
+        if group is not None:
+            targets.append(('group_posts', reverse(
+                'posts:group_posts', args=(group.slug,)), False))
+        stats = UserStats.objects.select_related('user').order_by(
+            '-posts_count').first()
+        if stats is not None:
+            targets.append(('profile', reverse(
+                'posts:profile', args=(stats.user.username,)), False))
+        post = Post.objects.select_related('author').order_by(
+            '-comment_count').first()
+        targets.append(('post_view', reverse(
+            'posts:post', args=(post.author.username, post.pk)), False))
+        targets.append(('follow_index', reverse('posts:follow_index'), True))
+        return targets
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            client.get(url)
+        timings = []
+        for _ in range(max(options['repeat'], 1)):
+            if options['cold']:
+                cache.clear()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'url': url,
+            'status': response.status_code,
+            'runs': len(timings),
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'mean_ms': statistics.mean(timings),
+            'max_ms': timings[-1],
+            'queries': counter.count,
+            'bytes': len(response.content),
+        }
+
+    def meta(self, options):
+        return {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cold_cache': options['cold'],
+            'pagination': settings.PAGINATION_MODE,
+            'rows': {model.__name__.lower(): model.objects.count()
+                     for model in (User, Group, Post, Comment, Follow)},
+        }
+
+
+def percentile(values, percent):
+    """Return nearest-rank percentile of sorted values."""
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
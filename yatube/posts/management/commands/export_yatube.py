@@ -0,0 +1,31 @@
+import gzip
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = ('Export groups, posts, comments and follows to gzipped JSONL '
+            'files, one per model.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--chunk-size', type=int,
+                            default=export.CHUNK_SIZE,
+                            help='Rows fetched from database at once.')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        os.makedirs(directory, exist_ok=True)
+        for name, queryset in export.site_querysets().items():
+            path = os.path.join(directory, f'{name}.jsonl.gz')
+            count = 0
+            with gzip.open(path, 'wt', encoding='utf-8') as target:
+                for line in export.jsonl(export.rows(
+                        name, queryset, options['chunk_size'])):
+                    target.write(line)
+                    count += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{count} {name} written to {path}.'))
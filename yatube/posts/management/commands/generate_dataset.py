@@ -0,0 +1,218 @@
+import datetime
+import random
+import time
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from posts import bulk
+from posts.models import Comment, Follow, Group, Post, User
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+WORDS = (
+    'лес', 'река', 'город', 'утро', 'дорога', 'книга', 'кот', 'море',
+    'снег', 'ветер', 'солнце', 'поезд', 'окно', 'чай', 'друг', 'песня',
+    'небо', 'дом', 'сад', 'озеро', 'работа', 'вечер', 'мост', 'письмо',
+    'гора', 'дождь', 'поле', 'звезда', 'улица', 'музыка',
+)
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic users, groups, posts, comments and '
+            'follows with power-law distributions for benchmarks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=SIZES,
+                            help='Preset number of posts.')
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--users', type=int,
+                            help='Default: one user per 20 posts.')
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=float, default=3,
+                            help='Mean number of comments per post.')
+        parser.add_argument('--follows', type=float, default=20,
+                            help='Mean number of authors followed by user.')
+        parser.add_argument('--images', type=float, default=0.1,
+                            help='Share of posts with images.')
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Exponent of Zipf popularity of authors.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Posts are spread over the last days.')
+        parser.add_argument('--prefix', default='synth',
+                            help='Prefix of usernames, group slugs '
+                                 'and image names.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int,
+                            help='Rows per INSERT, by default and at most '
+                                 'as many as the database allows.')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows per transaction.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.chunk_size = options['chunk_size']
+        self.prefix = options['prefix']
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Users with prefix "{self.prefix}" exist, use --prefix.')
+        posts = SIZES[options['size']] if options['size'] else options[
+            'posts']
+        users = options['users'] or max(posts // 20, 10)
+        started = time.monotonic()
+        user_ids = self.create_users(users)
+        bulk.refresh(user_ids=user_ids)
+        group_ids = self.create_groups(options['groups'])
+        images = self.create_images(4) if options['images'] else []
+        self.create_posts(posts, user_ids, group_ids, images, options)
+        self.create_follows(user_ids, options['follows'], options['alpha'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {users} users, {len(group_ids)} groups, '
+            f'{posts} posts, {self.comments} comments and '
+            f'{self.follows} follows in '
+            f'{time.monotonic() - started:.1f}s.'
+        ))
+
+    def insert(self, objects, **kwargs):
+        with transaction.atomic():
+            bulk.insert(objects, self.batch_size, **kwargs)
+
+    def insert_follows(self, follows):
+        with transaction.atomic():
+            bulk.insert(follows, self.batch_size, ignore_conflicts=True)
+            bulk.refresh(follows=follows)
+        self.follows += len(follows)
+
+    def create_users(self, count):
+        password = make_password(None)
+        for start in range(0, count, self.chunk_size):
+            self.insert([
+                User(username=f'{self.prefix}{number}', password=password,
+                     first_name=self.rng.choice(WORDS).title())
+                for number in range(start, min(start + self.chunk_size,
+                                               count))
+            ])
+        return list(User.objects.filter(
+            username__startswith=self.prefix).values_list('pk', flat=True))
+
+    def create_groups(self, count):
+        if not count:
+            return []
+        self.insert([
+            Group(slug=f'{self.prefix}-{number}',
+                  title=f'{self.rng.choice(WORDS).title()} {number}',
+                  description=self.text(5, 30))
+            for number in range(count)
+        ])
+        return list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-').values_list('pk', flat=True))
+
+    def create_images(self, count):
+        """Save sample images to share between posts."""
+        names = []
+        for number in range(count):
+            image = Image.linear_gradient('L').resize((1200, 800)).convert(
+                'RGB')
+            image.paste(tuple(self.rng.randrange(256) for _ in range(3)),
+                        (0, 0, 600, 400))
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=85)
+            names.append(default_storage.save(
+                f'posts/{self.prefix}-{number}.jpg',
+                ContentFile(buffer.getvalue())))
+        return names
+
+    def create_posts(self, count, user_ids, group_ids, images, options):
+        """Create posts of Zipf-distributed authors, oldest first, and
+        their comments."""
+        rng = self.rng
+        authors = self.zipf(user_ids, options['alpha'])
+        groups = self.zipf(group_ids, options['alpha'])
+        start_pk = (Post.objects.aggregate(pk=Max('pk'))['pk'] or 0) + 1
+        comment_pk = Comment.objects.aggregate(pk=Max('pk'))['pk'] or 0
+        now = timezone.now()
+        span = datetime.timedelta(days=options['days'])
+        self.comments = 0
+        for start in range(0, count, self.chunk_size):
+            posts = []
+            comments = []
+            for number in range(start, min(start + self.chunk_size, count)):
+                pub_date = now - span * (1 - number / count)
+                post = Post(
+                    pk=start_pk + number,
+                    text=self.text(5, 60),
+                    author_id=authors(),
+                    group_id=groups() if rng.random() < 0.7 else None,
+                    image=(rng.choice(images)
+                           if rng.random() < options['images'] else None),
+                    pub_date=pub_date,
+                )
+                posts.append(post)
+                for _ in range(self.heavy_tail(options['comments'])):
+                    comment_pk += 1
+                    comments.append(Comment(
+                        pk=comment_pk,
+                        post_id=post.pk,
+                        author_id=authors(),
+                        text=self.text(1, 20),
+                        created=pub_date + datetime.timedelta(
+                            minutes=rng.randrange(1, 60 * 24)),
+                    ))
+            with transaction.atomic():
+                bulk.insert_dated(posts, 'pub_date', self.batch_size)
+                if comments:
+                    bulk.insert_dated(comments, 'created', self.batch_size)
+                bulk.refresh(posts=posts, comments=comments)
+            self.comments += len(comments)
+            self.stdout.write(f'{start + len(posts)} posts')
+
+    def create_follows(self, user_ids, mean, alpha):
+        """Create follows of Zipf-distributed authors, so the number
+        of followers follows a power law."""
+        authors = self.zipf(user_ids, alpha)
+        self.follows = 0
+        follows = []
+        for user_id in user_ids:
+            count = min(self.heavy_tail(mean), len(user_ids) - 1)
+            followed = set()
+            for _ in range(count * 3):
+                if len(followed) >= count:
+                    break
+                author_id = authors()
+                if author_id != user_id:
+                    followed.add(author_id)
+            follows.extend(Follow(user_id=user_id, author_id=author_id)
+                           for author_id in followed)
+            if len(follows) >= self.chunk_size:
+                self.insert_follows(follows)
+                follows = []
+        if follows:
+            self.insert_follows(follows)
+
+    def zipf(self, values, alpha):
+        """Return function choosing from values in random order of
+        popularity with Zipf weights."""
+        if not values:
+            return lambda: None
+        values = list(values)
+        self.rng.shuffle(values)
+        cum_weights = list(accumulate(
+            1 / rank ** alpha for rank in range(1, len(values) + 1)))
+        return lambda: self.rng.choices(values, cum_weights=cum_weights)[0]
+
+    def heavy_tail(self, mean):
+        """Return random non-negative integer with Pareto tail."""
+        return round(mean * (self.rng.paretovariate(2) - 1))
+
+    def text(self, min_words, max_words):
+        return ' '.join(self.rng.choices(
+            WORDS, k=self.rng.randint(min_words, max_words))).capitalize()
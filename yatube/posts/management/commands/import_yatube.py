@@ -0,0 +1,204 @@
+import csv
+import gzip
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import bulk
+from posts.models import Comment, Follow, Group, Post, User
+
+TYPES = ('group', 'post', 'comment', 'follow')
+# Type: auto_now_add field restored after insert.
+DATE_FIELDS = {'post': 'pub_date', 'comment': 'created'}
+FILE_TYPES = {f'{record_type}s': record_type for record_type in TYPES}
+
+
+class Command(BaseCommand):
+    help = ('Import groups, posts, comments and follows from JSONL or CSV '
+            'files (optionally gzipped) with batched bulk inserts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Input format, by default guessed from file extension.'
+        )
+        parser.add_argument(
+            '--type', choices=TYPES,
+            help='Type of all records. By default taken from "type" key '
+                 'of each record or from file name, e.g. posts.jsonl.gz.'
+        )
+        parser.add_argument('--batch-size', type=int,
+                            help='Rows per INSERT, by default and at most '
+                                 'as many as the database allows.')
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help='Rows per transaction.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.chunk_size = options['chunk_size']
+        self.usernames = dict(User.objects.values_list('username', 'pk'))
+        self.slugs = dict(Group.objects.values_list('slug', 'pk'))
+        self.pending = {record_type: [] for record_type in TYPES}
+        self.counts = dict.fromkeys(TYPES, 0)
+        self.total = 0
+        self.started = time.monotonic()
+        for path in options['files']:
+            self.import_file(path, options['format'], options['type'])
+        elapsed = time.monotonic() - self.started
+        summary = ', '.join(f'{count} {record_type}s'
+                            for record_type, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {summary} in {elapsed:.1f}s '
+            f'({self.total / max(elapsed, 1e-6):.0f} rows/s).'
+        ))
+
+    def import_file(self, path, input_format, record_type):
+        name = os.path.basename(path)
+        if name.endswith('.gz'):
+            name = name[:-3]
+        stem, ext = os.path.splitext(name)
+        input_format = input_format or ext.lstrip('.')
+        if input_format not in ('jsonl', 'csv'):
+            raise CommandError(f'Unknown format of {path}, use --format.')
+        record_type = record_type or FILE_TYPES.get(stem)
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', newline='') as source:
+            if input_format == 'csv':
+                rows = csv.DictReader(source)
+            else:
+                rows = (json.loads(line) for line in source if line.strip())
+            rows = enumerate(rows, 1)
+            while True:
+                with transaction.atomic():
+                    self.last_pks = {}
+                    chunk = 0
+                    for line_number, row in islice(rows, self.chunk_size):
+                        row_type = row.pop('type', None) or record_type
+                        if row_type not in TYPES:
+                            raise CommandError(
+                                f'{path}:{line_number}: unknown record type.')
+                        self.add(row_type, row)
+                        chunk += 1
+                    self.flush()
+                self.report()
+                if chunk < self.chunk_size:
+                    break
+
+    def add(self, record_type, row):
+        make = getattr(self, f'make_{record_type}')
+        obj = make(row)
+        if obj is None:
+            return
+        self.pending[record_type].append(obj)
+
+    def make_group(self, row):
+        return Group(slug=row['slug'], title=row['title'],
+                     description=row.get('description') or '')
+
+    def make_post(self, row):
+        author_id = self.user_id(row['author'])
+        group_id = self.group_id(row.get('group'))
+        return Post(pk=self.pk(Post, row.get('id')),
+                    text=row['text'],
+                    author_id=author_id,
+                    group_id=group_id,
+                    image=row.get('image') or None,
+                    pub_date=_datetime(row.get('pub_date')))
+
+    def make_comment(self, row):
+        return Comment(pk=self.pk(Comment, row.get('id')),
+                       post_id=row['post'],
+                       author_id=self.user_id(row['author']),
+                       text=row['text'],
+                       created=_datetime(row.get('created')))
+
+    def make_follow(self, row):
+        user_id = self.user_id(row['user'])
+        author_id = self.user_id(row['author'])
+        if user_id == author_id:
+            return None
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def pk(self, model, value):
+        """Return primary key of imported row: its id or the next one.
+        Keys are explicit, so the dates can be restored by pk. The last
+        key is read again in every chunk transaction, after rows saved
+        by the site in between."""
+        last = self.last_pks.get(model)
+        if last is None:
+            last = model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+        pk = int(value) if value else last + 1
+        self.last_pks[model] = max(last, pk)
+        return pk
+
+    def user_id(self, username):
+        """Return pk of user, creating missing users."""
+        if username not in self.usernames:
+            user = User(username=username)
+            user.set_unusable_password()
+            user.save()
+            self.usernames[username] = user.pk
+        return self.usernames[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.slugs:
+            self.flush()
+            group = Group.objects.filter(slug=slug).first()
+            if group is None:
+                raise CommandError(f'Group "{slug}" not found.')
+            self.slugs[slug] = group.pk
+        return self.slugs[slug]
+
+    def flush(self):
+        """Insert pending rows of the chunk, parents first, and update
+        timelines, counters and caches they affect."""
+        inserted = {}
+        for record_type in TYPES:
+            objects = self.pending[record_type]
+            if not objects:
+                continue
+            if record_type in DATE_FIELDS:
+                created = bulk.insert_dated(
+                    objects, DATE_FIELDS[record_type], self.batch_size)
+            else:
+                created = bulk.insert(
+                    objects, self.batch_size,
+                    ignore_conflicts=record_type == 'follow')
+            if record_type == 'group':
+                self.slugs.update((group.slug, group.pk) for group in
+                                  Group.objects.filter(slug__in=[
+                                      group.slug for group in created]))
+            if record_type != 'group':
+                inserted[f'{record_type}s'] = objects
+            self.counts[record_type] += len(objects)
+            self.total += len(objects)
+            self.pending[record_type] = []
+        if inserted:
+            bulk.refresh(**inserted)
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'{self.total} rows, {self.total / max(elapsed, 1e-6):.0f} rows/s'
+        )
+
+
+def _datetime(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f'Wrong date: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
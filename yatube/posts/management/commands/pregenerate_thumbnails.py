@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+# Posts submitted to the pool at once per worker.
+CHUNK_PER_WORKER = 10
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails of post images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Number of generating threads.'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate also images which have variants.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(image_widths='')
+        post_ids = posts.values_list('pk', flat=True).iterator()
+        chunk_size = options['workers'] * CHUNK_PER_WORKER
+        ready = total = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for chunk in iter(lambda: list(islice(post_ids, chunk_size)),
+                              []):
+                ready += sum(pool.map(thumbnails.generate, chunk))
+                total += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Thumbnails ready: {ready} of {total} images.'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_comment_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount Post.comment_count from comments.'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_comment_counts()
+        self.stdout.write(
+            self.style.SUCCESS(f'Comment counters fixed: {fixed} posts.')
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import repair_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount followers, following and posts of all users.'
+
+    def handle(self, *args, **options):
+        fixed = repair_user_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f'User stats fixed: {fixed} users.')
+        )
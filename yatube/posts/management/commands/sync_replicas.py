@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Copy the default SQLite database to read replicas with '
+            'the SQLite backup API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*',
+                            help='Default: DATABASE_REPLICAS.')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Repeat every interval seconds.')
+        parser.add_argument('--pages', type=int, default=-1,
+                            help='Pages copied per step, -1 copies all '
+                                 'at once.')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('No replicas, set DATABASE_REPLICAS.')
+        source = connections[DEFAULT_DB_ALIAS]
+        for alias in (DEFAULT_DB_ALIAS, *aliases):
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'Database "{alias}" is not SQLite.')
+        while True:
+            source.ensure_connection()
+            for alias in aliases:
+                started = time.monotonic()
+                target = connections[alias]
+                target.ensure_connection()
+                source.connection.backup(target.connection,
+                                         pages=options['pages'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'{alias} synced in {time.monotonic() - started:.2f}s.'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+def count_comments(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.execute(
+        f'UPDATE {Post._meta.db_table} SET comment_count = ('
+        f'SELECT COUNT(*) FROM {Comment._meta.db_table} c '
+        f'WHERE c.post_id = {Post._meta.db_table}.id)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
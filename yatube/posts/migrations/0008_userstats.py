@@ -0,0 +1,48 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_user_stats(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserStats = apps.get_model('posts', 'UserStats')
+    follow = Follow._meta.db_table
+    schema_editor.execute(
+        f'INSERT INTO {UserStats._meta.db_table} '
+        '(user_id, followers_count, following_count, posts_count) '
+        'SELECT u.id, '
+        f'(SELECT COUNT(*) FROM {follow} f WHERE f.author_id = u.id), '
+        f'(SELECT COUNT(*) FROM {follow} f WHERE f.user_id = u.id), '
+        f'(SELECT COUNT(*) FROM {Post._meta.db_table} p '
+        'WHERE p.author_id = u.id) '
+        f'FROM {User._meta.db_table} u'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0007_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписан')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Записей')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(count_user_stats, migrations.RunPython.noop),
+    ]
@@ -42,11 +42,25 @@ class Post(models.Model):
                               blank=True,
                               null=True,
                               help_text='Выберите изображение')
+    image_widths = models.CharField('Ширины вариантов картинки',
+                                    max_length=64,
+                                    blank=True,
+                                    editable=False)
+    comment_count = models.PositiveIntegerField('Комментариев',
+                                                default=0,
+                                                editable=False)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Запись'
         verbose_name_plural = 'Записи'
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'), name='post_date_id_idx'),
+            models.Index(fields=('author', '-pub_date'),
+                         name='post_author_date_idx'),
+            models.Index(fields=('group', '-pub_date'),
+                         name='post_group_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -73,6 +87,10 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(fields=('post', '-created', '-id'),
+                         name='comment_post_created_id_idx'),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -102,3 +120,53 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user.username} to {self.author.username}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='Подписчик',
+                             help_text='Подписчик'
+                             )
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             verbose_name='Запись',
+                             help_text='Запись'
+                             )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='timeline-user-post'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date'),
+                         name='timeline_user_date_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.user.username}: {self.post_id}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats',
+                                verbose_name='Пользователь')
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписан', default=0)
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'{self.user.username} stats'
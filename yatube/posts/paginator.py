@@ -0,0 +1,191 @@
+"""Paginators for large tables.
+
+Keyset (cursor) pagination: pages are addressed by opaque tokens with
+the ordering values of the boundary row, so every page costs one
+indexed range read of per_page + 1 rows: no COUNT(*) and no OFFSET
+scan.
+
+Estimated count pagination: unfiltered big tables are counted from
+database statistics instead of COUNT(*).
+"""
+import base64
+import binascii
+import datetime
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+MIN_INT, MAX_INT = -2 ** 63, 2 ** 63 - 1
+
+
+class CursorPage(Sequence):
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginate queryset by the unique ordering, e.g. ('-pub_date', '-id').
+    Works with model instances and values() rows."""
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def get_page(self, cursor):
+        """Return page for cursor token. Invalid or empty token gives
+        the first page."""
+        direction, values = self.decode(cursor)
+        queryset = self.object_list
+        ordering = self.ordering
+        if direction == PREVIOUS:
+            ordering = tuple(_reverse(field) for field in ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, values))
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode(NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode(PREVIOUS, rows[0])
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+    def encode(self, direction, row):
+        values = [_value(row, name) for name in self._names()]
+        raw = json.dumps([direction, values], separators=(',', ':'),
+                         default=isoformat)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        if not cursor:
+            return NEXT, None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+            if (direction not in (NEXT, PREVIOUS)
+                    or len(values) != len(self.ordering)):
+                return NEXT, None
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self._names(), values)
+            ]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return NEXT, None
+        # None can't be compared and integers beyond 64 bits overflow
+        # the database drivers: both would fail the query.
+        if any(value is None or (isinstance(value, int)
+                                 and not MIN_INT <= value <= MAX_INT)
+               for value in values):
+            return NEXT, None
+        return direction, values
+
+    def _names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def _field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    @staticmethod
+    def _after(ordering, values):
+        """Build (a, b, ...) > (va, vb, ...) condition for ordering."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator which doesn't run COUNT(*) over unfiltered tables
+    bigger than ESTIMATED_COUNT_THRESHOLD rows."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if (estimate is not None
+                    and estimate > settings.ESTIMATED_COUNT_THRESHOLD):
+                return estimate
+        return super().count
+
+
+def estimate_count(model, using='default'):
+    """Return estimated number of rows in table of model
+    or None if it can't be estimated."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                (table,))
+        elif connection.vendor == 'sqlite':
+            pk = model._meta.pk.column
+            cursor.execute(
+                f'SELECT MAX({connection.ops.quote_name(pk)}) '
+                f'FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def _value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def isoformat(value):
+    """Serialize datetimes with full precision, unlike DjangoJSONEncoder
+    which truncates microseconds and would break keyset comparison."""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _reverse(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
@@ -0,0 +1,39 @@
+"""Full-text search of posts.
+
+On SQLite posts are indexed by the FTS5 table posts_post_fts, kept in
+sync with posts_post by triggers (migration 0011). Other databases
+fall back to a LIKE scan.
+"""
+import re
+
+from django.db import connection
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Return FTS5 MATCH expression finding posts with all words of
+    query as prefixes, or None if query has no words."""
+    words = WORD.findall(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_posts(posts, query):
+    """Filter posts queryset by query, ordered by relevance."""
+    expression = match_expression(query)
+    if expression is None:
+        return posts.none()
+    if connection.vendor != 'sqlite':
+        return posts.filter(text__icontains=query)
+    table = posts.model._meta.db_table
+    return posts.extra(
+        tables=(FTS_TABLE,),
+        where=(f'{FTS_TABLE}.rowid = {table}.id',
+               f'{FTS_TABLE} MATCH %s'),
+        params=(expression,),
+        select={'rank': f'bm25({FTS_TABLE})'},
+        order_by=('rank',),
+    )
@@ -0,0 +1,115 @@
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from posts import caching, timeline
+from posts.counters import change_user_stats
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    """Create empty stats record for new user."""
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    """Deliver new post to followers timelines, count it to author."""
+    if created:
+        timeline.fan_out_post(instance)
+        change_user_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Uncount deleted post from author stats."""
+    change_user_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    """Fill follower timeline with posts of the followed author,
+    count the follow to both users."""
+    if created:
+        timeline.backfill(instance)
+        change_user_stats(instance.author_id, followers_count=1)
+        change_user_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Drop posts of the unfollowed author from follower timeline,
+    uncount the follow from both users."""
+    timeline.prune(instance)
+    change_user_stats(instance.author_id, followers_count=-1)
+    change_user_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    """Invalidate profile cards of both users."""
+    caching.bump_version(caching.profile_scope(instance.author_id),
+                         caching.profile_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    """Increase comment counter of the commented post."""
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Decrease comment counter of the commented post."""
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1
+    )
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    """Remember group of edited post to invalidate it if post moves."""
+    if instance.pk is not None:
+        instance._old_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    """Invalidate cached pages showing the post."""
+    caching.bump_version(*caching.post_scopes(
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, '_old_group_id', None)))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    """Invalidate cached pages showing the commented post."""
+    post = Post.objects.filter(
+        pk=instance.post_id).values('author_id', 'group_id').first()
+    if post is None:
+        caching.bump_version(caching.INDEX)
+        return
+    caching.bump_version(*caching.post_scopes(post['author_id'],
+                                              post['group_id']))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Invalidate cached pages showing the group title."""
+    authors = Post.objects.filter(
+        group=instance).values_list('author_id', flat=True).distinct()
+    caching.bump_version(caching.INDEX,
+                         caching.group_scope(instance.pk),
+                         *(caching.author_scope(pk) for pk in authors))
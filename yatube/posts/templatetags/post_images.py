@@ -0,0 +1,23 @@
+from django import template
+
+from posts.images import variant_name, variant_widths
+
+register = template.Library()
+
+
+@register.filter
+def srcset(post, ext):
+    storage = post.image.storage
+    return ', '.join(
+        f'{storage.url(variant_name(post.image.name, width, ext))} {width}w'
+        for width in variant_widths(post)
+    )
+
+
+@register.filter
+def largest_variant(post, ext):
+    widths = variant_widths(post)
+    if not widths:
+        return ''
+    return post.image.storage.url(
+        variant_name(post.image.name, widths[0], ext))
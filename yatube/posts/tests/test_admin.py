@@ -0,0 +1,87 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post, User
+
+USERNAME = 'testuser'
+
+
+class AdminChangelistTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='test',
+            slug='test',
+            description='test group'
+        )
+        cls.changelists = (reverse('admin:posts_post_changelist'),
+                           reverse('admin:posts_comment_changelist'))
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(AdminChangelistTests.admin)
+
+    def add_posts(self, number):
+        for post_num in range(number):
+            post = Post.objects.create(text=f'Пост {post_num}',
+                                       author=AdminChangelistTests.user,
+                                       group=AdminChangelistTests.group)
+            Comment.objects.create(post=post,
+                                   author=AdminChangelistTests.user,
+                                   text=f'Комментарий {post_num}')
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.admin_client.get(url, params)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_changelist_queries_do_not_grow(self):
+        """Changelists fetch related objects in the main query."""
+        self.add_posts(2)
+        few = {url: len(self.count_queries(url))
+               for url in self.changelists}
+        self.add_posts(20)
+        for url in self.changelists:
+            with self.subTest(url=url):
+                self.assertEqual(len(self.count_queries(url)), few[url])
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=0)
+    def test_changelist_count_is_estimated(self):
+        """Unfiltered changelist doesn't count rows with COUNT(*)."""
+        self.add_posts(3)
+        for url in self.changelists:
+            with self.subTest(url=url):
+                queries = self.count_queries(url)
+                self.assertFalse([sql for sql in queries
+                                  if 'COUNT(' in sql and '"posts_' in sql])
+        response = self.admin_client.get(self.changelists[0])
+        self.assertEqual(response.context['cl'].result_count,
+                         Post.objects.latest('pk').pk)
+
+    def test_pub_date_filter_uses_index(self):
+        """Filtering by pub_date reads the date index."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite')
+        self.add_posts(3)
+        today = timezone.localtime().replace(hour=0, minute=0, second=0,
+                                             microsecond=0)
+        queries = self.count_queries(self.changelists[0], {
+            'pub_date__gte': today.isoformat(),
+            'pub_date__lt': today.replace(year=today.year + 1).isoformat(),
+        })
+        main = [sql for sql in queries
+                if 'FROM "posts_post"' in sql and 'ORDER BY' in sql]
+        self.assertTrue(main)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {main[0]}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('post_date_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,130 @@
+import base64
+import json
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.utils import on_commit_callbacks
+
+USERNAME = 'testuser'
+USERNAME2 = 'followuser'
+
+
+@override_settings(THUMBNAIL_PREGENERATE=False)
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        cls.author = User.objects.create(username=USERNAME2)
+        cls.group = Group.objects.create(
+            title='test',
+            slug='test',
+            description='test group'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.posts = [
+            Post.objects.create(text=f'Пост {number}', author=cls.author,
+                                group=cls.group)
+            for number in range(settings.POST_PER_PAGE + 2)
+        ]
+        cls.post = cls.posts[0]
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ApiTests.user)
+
+    def get(self, url, client=None, status=HTTPStatus.OK, **params):
+        response = (client or self.client).get(url, params)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_index_pages(self):
+        """Pages of posts are linked by cursors and cover all posts."""
+        data = self.get(reverse('posts:api_index'))
+        self.assertEqual(data['results'][0], {
+            'id': self.posts[-1].pk,
+            'text': self.posts[-1].text,
+            'pub_date': data['results'][0]['pub_date'],
+            'author': USERNAME2,
+            'group': self.group.slug,
+            'image': None,
+            'comment_count': 0,
+        })
+        self.assertIsNone(data['previous'])
+        ids = [row['id'] for row in data['results']]
+        while data['next']:
+            data = self.get(data['next'])
+            ids.extend(row['id'] for row in data['results'])
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_broken_cursor(self):
+        """Cursors with values which can't be queried give the first
+        page."""
+        first = self.get(reverse('posts:api_index'))
+        for values in ([None, None], ['2020-01-01T00:00:00', 10 ** 30]):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps(['n', values]).encode()).decode()
+                self.assertEqual(
+                    self.get(reverse('posts:api_index'), cursor=cursor),
+                    first)
+
+    def test_fields(self):
+        """?fields= limits post fields, unknown fields are an error."""
+        data = self.get(reverse('posts:api_index'), fields='id,author')
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        data = self.get(data['next'])
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        data = self.get(reverse('posts:api_index'),
+                        status=HTTPStatus.BAD_REQUEST, fields='id,password')
+        self.assertEqual(data['detail'], 'Unknown fields: password.')
+
+    def test_pages(self):
+        """Group, profile and post mirror their pages."""
+        data = self.get(reverse('posts:api_group_posts',
+                                args=(self.group.slug,)))
+        self.assertEqual(data['group']['title'], self.group.title)
+        self.assertEqual(len(data['results']), settings.POST_PER_PAGE)
+        data = self.get(reverse('posts:api_profile', args=(USERNAME2,)))
+        self.assertEqual(data['author']['username'], USERNAME2)
+        self.assertEqual(data['author']['posts_count'], len(self.posts))
+        data = self.get(reverse('posts:api_post',
+                                args=(USERNAME2, self.post.pk)))
+        self.assertEqual(data['post']['comment_count'], 1)
+        self.assertEqual(data['results'][0]['author'], USERNAME)
+        self.get(reverse('posts:api_profile', args=('nobody',)),
+                 status=HTTPStatus.NOT_FOUND)
+
+    def test_follow_index(self):
+        """Follow feed needs login."""
+        self.get(reverse('posts:api_follow_index'),
+                 status=HTTPStatus.UNAUTHORIZED)
+        data = self.get(reverse('posts:api_follow_index'),
+                        self.authorized_client)
+        self.assertEqual(data['results'][0]['id'], self.posts[-1].pk)
+
+    def test_etag(self):
+        """Repeated request with ETag gets 304 until a new post."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        with on_commit_callbacks():
+            Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_read_only(self):
+        response = self.authorized_client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
@@ -0,0 +1,90 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts.management.commands import benchmark_sqlite
+from posts.models import Post, User
+from yatube.sqlite.base import DatabaseWrapper
+
+
+class SQLiteBackendTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.path = os.path.join(self.directory, 'test.sqlite3')
+
+    def wrapper(self, **options):
+        settings_dict = {**connection.settings_dict, 'NAME': self.path,
+                         'OPTIONS': options}
+        wrapper = DatabaseWrapper(settings_dict, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """Pragmas from OPTIONS are applied to new connections."""
+        wrapper = self.wrapper(pragmas={'journal_mode': 'WAL',
+                                        'synchronous': 'NORMAL',
+                                        'busy_timeout': 1234,
+                                        'mmap_size': 1024 * 1024})
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 1024 * 1024)
+
+    def test_immediate_transactions(self):
+        """Atomic blocks take the write lock at once."""
+        wrapper = self.wrapper(transaction_mode='IMMEDIATE')
+        wrapper.ensure_connection()
+        wrapper._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+            other.execute('BEGIN IMMEDIATE')
+        wrapper.connection.rollback()
+
+
+@override_settings(THUMBNAIL_PREGENERATE=False)
+class SQLiteBenchmarkTests(TransactionTestCase):
+    """Backup of the database waits for open transactions, so data
+    is committed."""
+
+    def setUp(self):
+        user = User.objects.create(username='testuser')
+        Post.objects.create(text='Пост', author=user)
+
+    def test_benchmark_sqlite(self):
+        """Benchmark runs both profiles with cold caches on copies of
+        the database."""
+        database = dict(connection.settings_dict)
+        out = StringIO()
+        warm = []
+        run = benchmark_sqlite.Command.run
+
+        def cold_run(command, options):
+            warm.append(cache.get('benchmark:warm'))
+            cache.set('benchmark:warm', True)
+            return run(command, options)
+
+        with mock.patch.object(benchmark_sqlite.Command, 'run', cold_run):
+            call_command('benchmark_sqlite', duration=0.3, readers=1,
+                         writers=1, stdout=out)
+        self.assertEqual(warm, [None, None])
+        output = out.getvalue()
+        self.assertIn('baseline', output)
+        self.assertIn('production/baseline', output)
+        self.assertEqual(dict(connection.settings_dict), database)
+        self.assertEqual(Post.objects.count(), 1)
@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_PREGENERATE=False)
+class DatasetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('generate_dataset', posts=60, users=12, groups=3,
+                     comments=2, follows=3, images=0.2, chunk_size=25,
+                     stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_generate_dataset(self):
+        """Data is generated with dates, images and rebuilt timelines."""
+        self.assertEqual(User.objects.count(), 12)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(Comment.objects.exists())
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')).exists())
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater((dates[-1] - dates[0]).days, 300)
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
+        self.assertGreater(Comment.objects.filter(
+            created__lt=dates[-1]).count(), Comment.objects.count() // 2)
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            Post.objects.filter(
+                author__following__isnull=False).count())
+
+    def test_benchmark_views(self):
+        """Benchmark saves timings, queries and sizes of every view."""
+        output = os.path.join(TEMP_MEDIA_ROOT, 'bench.json')
+        call_command('benchmark_views', repeat=3, warmup=1, cold=True,
+                     output=output, stdout=StringIO())
+        with open(output) as source:
+            report = json.load(source)
+        self.assertEqual(report['meta']['rows']['post'], 60)
+        self.assertEqual(
+            set(report['views']),
+            {'index', 'index_middle', 'group_posts', 'profile',
+             'post_view', 'follow_index'})
+        for name, result in report['views'].items():
+            with self.subTest(view=name):
+                self.assertEqual(result['status'], 200)
+                self.assertEqual(result['runs'], 3)
+                self.assertGreater(result['queries'], 0)
+                self.assertGreater(result['bytes'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
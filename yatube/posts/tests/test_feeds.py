@@ -0,0 +1,107 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.tests.utils import on_commit_callbacks
+
+USERNAME = 'testuser'
+USERNAME2 = 'otheruser'
+
+
+@override_settings(THUMBNAIL_PREGENERATE=False)
+class FeedTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        cls.other = User.objects.create(username=USERNAME2)
+        cls.group = Group.objects.create(
+            title='test',
+            slug='test',
+            description='test group'
+        )
+        cls.post = Post.objects.create(text='Пост в группе',
+                                       author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        """Feeds list posts of the site, group and author."""
+        feeds = {
+            reverse('posts:posts_rss'): 'application/rss+xml',
+            reverse('posts:posts_atom'): 'application/atom+xml',
+            reverse('posts:group_rss',
+                    args=(self.group.slug,)): 'application/rss+xml',
+            reverse('posts:group_atom',
+                    args=(self.group.slug,)): 'application/atom+xml',
+            reverse('posts:author_rss',
+                    args=(USERNAME,)): 'application/rss+xml',
+            reverse('posts:author_atom',
+                    args=(USERNAME,)): 'application/atom+xml',
+        }
+        post_url = reverse('posts:post', args=(USERNAME, self.post.pk))
+        for url, content_type in feeds.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type))
+                self.assertContains(response, 'Пост в группе')
+                self.assertContains(response, post_url)
+        response = self.client.get(reverse('posts:author_rss',
+                                           args=(USERNAME2,)))
+        self.assertNotContains(response, 'Пост в группе')
+        response = self.client.get(reverse('posts:group_rss',
+                                           args=('missing',)))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cache_invalidation(self):
+        """Feed is rendered once per new post of its group."""
+        url = reverse('posts:group_rss', args=(self.group.slug,))
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, first.content)
+        self.assertFalse(any('posts_post' in query['sql']
+                             for query in queries))
+        with on_commit_callbacks():
+            Post.objects.create(text='Пост вне группы', author=self.other)
+        self.assertEqual(self.client.get(url).content, first.content)
+        with on_commit_callbacks():
+            Post.objects.create(text='Новый пост', author=self.other,
+                                group=self.group)
+        self.assertContains(self.client.get(url), 'Новый пост')
+
+    @override_settings(ALLOWED_HOSTS=['yatube.test', 'mirror.test'])
+    def test_cache_per_host(self):
+        """Feed cached for one host doesn't give its links to another."""
+        url = reverse('posts:posts_rss')
+        self.assertContains(self.client.get(url, HTTP_HOST='yatube.test'),
+                            'http://yatube.test/')
+        response = self.client.get(url, HTTP_HOST='mirror.test')
+        self.assertContains(response, 'http://mirror.test/')
+        self.assertNotContains(response, 'yatube.test')
+
+    def test_conditional_get(self):
+        """Pollers with unchanged feed get 304."""
+        url = reverse('posts:author_atom', args=(USERNAME,))
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        with on_commit_callbacks():
+            Post.objects.create(text='Новый пост', author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_page_links_feeds(self):
+        response = self.client.get(reverse('posts:group_posts',
+                                           args=(self.group.slug,)))
+        self.assertContains(response, reverse('posts:group_atom',
+                                              args=(self.group.slug,)))
@@ -1,16 +1,49 @@
+import os
 import shutil
+import subprocess
+import sys
 import tempfile
+from io import BytesIO, StringIO
+from unittest import skipUnless
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from PIL.ExifTags import TAGS
 
+from posts.forms import PostForm
 from posts.models import Group, Post, User
+from users.forms import CreationForm
 
 USERNAME = 'testuser'
 POSTTEXT = 'Тут текст очередного нового поста'
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+EXIF_TAGS = {name: tag for tag, name in TAGS.items()}
+ORIENTATION = EXIF_TAGS['Orientation']
+MODEL = EXIF_TAGS['Model']
+MEASURE_INGEST = """
+import os, resource, sys
+import django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+sys.path.insert(0, os.getcwd())
+django.setup()
+from django.core.files.uploadedfile import SimpleUploadedFile
+from posts import images
+with open(sys.argv[1], 'rb') as image_file:
+    upload = SimpleUploadedFile('huge.jpg', image_file.read(), 'image/jpeg')
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+images.ingest(upload)
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print((after - before) * 1024)
+"""
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -198,4 +231,149 @@ class PostFormTests(TestCase):
         self.assertEqual(comment.text, comment_text['text'])
         self.assertEqual(comment.author, PostFormTests.user)
         self.assertEqual(comment.created,
-                         auth_response.context['comments'].first().created)
+                         auth_response.context['comments_page'][0].created)
+
+    def test_comment_counter(self):
+        """Comment counter follows added and deleted comments
+        and is repaired by reconcile_comment_counts."""
+        post = Post.objects.create(
+            text="Пост для теста счетчика комментариев",
+            author=PostFormTests.user,
+        )
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(USERNAME, post.id,)),
+            data={'text': 'Первый'}
+        )
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(USERNAME, post.id,)),
+            data={'text': 'Второй'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+
+        post.comments.first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        Post.objects.filter(pk=post.pk).update(comment_count=10)
+        call_command('reconcile_comment_counts', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_image_is_downscaled_without_exif(self):
+        """Uploaded image is fit into POST_IMAGE_MAX_SIZE, rotated
+        by EXIF orientation and saved without EXIF."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        exif[MODEL] = 'Secret camera'
+        buffer = BytesIO()
+        Image.new('RGB', (3000, 2000), (200, 10, 10)).save(
+            buffer, 'JPEG', exif=exif.tobytes())
+        upload = SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                                    content_type='image/jpeg')
+        self.authorized_client.post(
+            reverse('posts:new_post'),
+            data={'text': POSTTEXT, 'image': upload}
+        )
+        post = Post.objects.get(text=POSTTEXT)
+        with Image.open(post.image.path) as image:
+            max_width, max_height = settings.POST_IMAGE_MAX_SIZE
+            self.assertLessEqual(image.width, max_width)
+            self.assertLessEqual(image.height, max_height)
+            self.assertGreater(image.height, image.width)
+            self.assertNotIn('exif', image.info)
+
+    def test_too_large_image_rejected(self):
+        """Image which can't be decoded within memory budget
+        is rejected by the form."""
+        buffer = BytesIO()
+        Image.new('RGB', (600, 400)).save(buffer, 'PNG')
+        upload = SimpleUploadedFile('big.png', buffer.getvalue(),
+                                    content_type='image/png')
+        with self.settings(POST_IMAGE_MAX_DECODE_BYTES=600 * 400 * 4):
+            form = PostForm(data={'text': POSTTEXT},
+                            files={'image': upload})
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+        self.assertIn('Изображения PNG можно загружать размером не более',
+                      form.errors['image'][0])
+
+    def test_large_png_downscaled(self):
+        """PNG bigger than POST_IMAGE_MAX_SIZE is decoded in full within
+        the memory budget and downscaled."""
+        buffer = BytesIO()
+        Image.new('RGB', (4000, 3000), (10, 200, 10)).save(buffer, 'PNG')
+        upload = SimpleUploadedFile('big.png', buffer.getvalue(),
+                                    content_type='image/png')
+        form = PostForm(data={'text': POSTTEXT}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.format, 'PNG')
+            self.assertEqual(image.size, (1920, 1440))
+
+    def test_animated_gif_rejected(self):
+        """Animated GIF is rejected instead of saving its first frame."""
+        frames = [Image.new('P', (20, 20), color) for color in (1, 2)]
+        buffer = BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:])
+        upload = SimpleUploadedFile('anim.gif', buffer.getvalue(),
+                                    content_type='image/gif')
+        form = PostForm(data={'text': POSTTEXT}, files={'image': upload})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['image'],
+                         ['Анимированные изображения не поддерживаются.'])
+
+    def test_truncated_image_rejected(self):
+        """Image which passes the header check but fails to decode is
+        a form error."""
+        buffer = BytesIO()
+        Image.effect_noise((200, 200), 64).convert('RGB').save(buffer,
+                                                               'JPEG')
+        data = buffer.getvalue()
+        upload = SimpleUploadedFile('half.jpg', data[:len(data) // 2],
+                                    content_type='image/jpeg')
+        response = self.authorized_client.post(
+            reverse('posts:new_post'),
+            {'text': POSTTEXT, 'image': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Загрузите правильное изображение. Файл, который вы загрузили, '
+            'поврежден или не является изображением.')
+        self.assertFalse(Post.objects.filter(text=POSTTEXT).exists())
+
+    @skipUnless(resource and sys.platform.startswith('linux'),
+                'ru_maxrss in KiB is Linux specific')
+    def test_ingest_peak_memory(self):
+        """Peak memory of ingesting a 24 Mpx JPEG stays within
+        POST_IMAGE_MAX_DECODE_BYTES, below its full decode size."""
+        width, height = 6000, 4000
+        path = os.path.join(TEMP_MEDIA_ROOT, 'huge.jpg')
+        Image.new('RGB', (width, height), (120, 30, 200)).save(path)
+        child = subprocess.run(
+            (sys.executable, '-c', MEASURE_INGEST, path),
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True)
+        peak = int(child.stdout)
+        self.assertLess(peak, settings.POST_IMAGE_MAX_DECODE_BYTES)
+        self.assertLess(peak, width * height * 4)
+
+
+class SignUpFormTests(TestCase):
+
+    def test_url_names_reserved(self):
+        """Names of site URLs like api/ or rss/ can't be taken by users,
+        their profiles would be unreachable."""
+        data = {'username': 'api', 'password1': 'Kx9#mq2Lr',
+                'password2': 'Kx9#mq2Lr'}
+        for username in ('api', 'rss', 'atom', 'new', 'metrics', 'about'):
+            with self.subTest(username=username):
+                form = CreationForm(data={**data, 'username': username})
+                self.assertFalse(form.is_valid())
+                self.assertEqual(form.errors['username'],
+                                 ['Это имя занято адресом на сайте.'])
+        response = self.client.post(reverse('signup'),
+                                    {**data, 'username': 'apireader'})
+        self.assertRedirects(response, reverse('login'))
+        self.assertTrue(User.objects.filter(username='apireader').exists())
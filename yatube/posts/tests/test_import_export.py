@@ -0,0 +1,236 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import caching
+from posts.management.commands import import_yatube
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.tests.utils import on_commit_callbacks
+
+USERNAME = 'testuser'
+USERNAME2 = 'followuser'
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username=USERNAME)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_jsonl(self, name, rows):
+        path = os.path.join(self.tmp_dir, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as target:
+            for row in rows:
+                target.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def test_import_jsonl(self):
+        """All types are imported with dates, missing users are created
+        and denormalized data is rebuilt."""
+        path = self.write_jsonl('dump.jsonl', [
+            {'type': 'group', 'slug': 'cats', 'title': 'Котики'},
+            {'type': 'post', 'id': 100, 'text': 'Старый пост',
+             'author': USERNAME2, 'group': 'cats',
+             'pub_date': '2015-03-01T10:00:00.123456+00:00'},
+            {'type': 'post', 'id': 101, 'text': 'Ещё пост',
+             'author': USERNAME2},
+            {'type': 'comment', 'post': 100, 'author': USERNAME,
+             'text': 'Комментарий', 'created': '2015-03-02T10:00:00'},
+            {'type': 'follow', 'user': USERNAME, 'author': USERNAME2},
+            {'type': 'follow', 'user': USERNAME, 'author': USERNAME2},
+        ])
+        version = caching.get_version(caching.INDEX)
+        out = StringIO()
+        with on_commit_callbacks():
+            call_command('import_yatube', path, batch_size=2, chunk_size=3,
+                         stdout=out)
+        self.assertIn('rows/s', out.getvalue())
+        author = User.objects.get(username=USERNAME2)
+        self.assertFalse(author.has_usable_password())
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.author, author)
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.pub_date.microsecond, 123456)
+        self.assertEqual(post.comment_count, 1)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.created.year, 2015)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(author.stats.posts_count, 2)
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertNotEqual(caching.get_version(caching.INDEX), version)
+        new_post = Post.objects.create(text='Новый', author=self.user)
+        self.assertGreater(new_post.pk, 101)
+        self.assertTrue(
+            Post._meta.get_field('pub_date').auto_now_add)
+
+    def test_import_refreshes_only_touched_rows(self):
+        """Timelines of other users aren't rebuilt, caches of authors of
+        commented posts and of both users of follows are invalidated."""
+        author = User.objects.create(username=USERNAME2)
+        reader = User.objects.create(username='reader')
+        post = Post.objects.create(text='Пост автора', author=author)
+        Follow.objects.create(user=reader, author=author)
+        TimelineEntry.objects.filter(user=reader).delete()
+        path = self.write_jsonl('dump.jsonl', [
+            {'type': 'comment', 'post': post.pk, 'author': USERNAME,
+             'text': 'Импортированный комментарий'},
+            {'type': 'follow', 'user': USERNAME, 'author': USERNAME2},
+        ])
+        scopes = (caching.author_scope(author.pk),
+                  caching.profile_scope(author.pk),
+                  caching.profile_scope(self.user.pk))
+        versions = [caching.get_version(scope) for scope in scopes]
+        with on_commit_callbacks():
+            call_command('import_yatube', path, stdout=StringIO())
+        self.assertFalse(TimelineEntry.objects.filter(user=reader).exists())
+        self.assertEqual(list(TimelineEntry.objects.filter(
+            user=self.user).values_list('post', flat=True)), [post.pk])
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        author.stats.refresh_from_db()
+        self.assertEqual(author.stats.followers_count, 2)
+        for scope, version in zip(scopes, versions):
+            with self.subTest(scope=scope):
+                self.assertNotEqual(caching.get_version(scope), version)
+
+    def test_import_csv_and_gzip(self):
+        """CSV rows take type from --type, gzipped JSONL from file name."""
+        Group.objects.create(title='Собаки', slug='dogs')
+        path = os.path.join(self.tmp_dir, 'rows.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as target:
+            writer = csv.DictWriter(target, ('text', 'author', 'group'))
+            writer.writeheader()
+            writer.writerow({'text': 'Из CSV', 'author': USERNAME,
+                             'group': 'dogs'})
+        call_command('import_yatube', path, type='post', stdout=StringIO())
+        post = Post.objects.get(text='Из CSV')
+        self.assertEqual(post.group.slug, 'dogs')
+        path = self.write_jsonl('comments.jsonl.gz', [
+            {'post': post.pk, 'author': USERNAME, 'text': 'Из gzip'},
+        ])
+        call_command('import_yatube', path, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_import_keeps_auto_dates_of_other_saves(self):
+        """Posts saved between import chunks get the current date and
+        don't clash with imported keys."""
+        path = self.write_jsonl('posts.jsonl', [
+            {'text': f'Старый пост {number}', 'author': USERNAME,
+             'pub_date': '2015-03-01T10:00:00+00:00'}
+            for number in range(2)
+        ])
+        saved = []
+
+        def save_post(command):
+            saved.append(Post.objects.create(text='Новый', author=self.user))
+
+        with mock.patch.object(import_yatube.Command, 'report', save_post):
+            call_command('import_yatube', path, chunk_size=1,
+                         stdout=StringIO())
+        self.assertEqual(saved[0].pub_date.date(), timezone.now().date())
+        self.assertEqual(
+            set(Post.objects.filter(text__startswith='Старый').values_list(
+                'pub_date__year', flat=True)), {2015})
+
+    def test_import_more_than_insert_limit(self):
+        """Default options import more rows than SQLite takes in one
+        INSERT."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        path = self.write_jsonl('comments.jsonl', [
+            {'post': post.pk, 'author': USERNAME, 'text': f'Коммент {number}'}
+            for number in range(600)
+        ])
+        call_command('import_yatube', path, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 600)
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        cls.author = User.objects.create(username=USERNAME2)
+        cls.group = Group.objects.create(title='Котики', slug='cats')
+        cls.post = Post.objects.create(text='Пост', author=cls.user,
+                                       group=cls.group)
+        Post.objects.create(text='Чужой пост', author=cls.author)
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ExportTests.user)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_export_command_round_trip(self):
+        """Exported files are imported back into empty database."""
+        call_command('export_yatube', self.tmp_dir, chunk_size=1,
+                     stdout=StringIO())
+        with gzip.open(os.path.join(self.tmp_dir, 'posts.jsonl.gz'),
+                       'rt', encoding='utf-8') as source:
+            rows = [json.loads(line) for line in source]
+        self.assertEqual(rows[0]['author'], USERNAME)
+        self.assertEqual(rows[0]['group'], 'cats')
+        pub_date = Post.objects.get(pk=ExportTests.post.pk).pub_date
+        for model in (Follow, Comment, Post, Group, User):
+            model.objects.all().delete()
+        paths = [os.path.join(self.tmp_dir, f'{name}.jsonl.gz')
+                 for name in ('groups', 'posts', 'comments', 'follows')]
+        call_command('import_yatube', *paths, stdout=StringIO())
+        post = Post.objects.get(pk=ExportTests.post.pk)
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Follow.objects.get().author.username, USERNAME2)
+
+    def test_profile_export(self):
+        """User downloads zip of own posts, comments and follows."""
+        response = self.authorized_client.get(
+            reverse('posts:profile_export', args=(USERNAME,)))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(BytesIO(b''.join(response)))
+        self.assertEqual(archive.namelist(),
+                         ['posts.jsonl', 'comments.jsonl', 'follows.jsonl'])
+        posts = archive.read('posts.jsonl').decode().splitlines()
+        self.assertEqual(len(posts), 1)
+        self.assertEqual(json.loads(posts[0])['text'], 'Пост')
+        follows = archive.read('follows.jsonl').decode()
+        self.assertIn(USERNAME2, follows)
+
+    def test_profile_export_only_own(self):
+        """Export of other user redirects to the profile."""
+        response = self.authorized_client.get(
+            reverse('posts:profile_export', args=(USERNAME2,)))
+        self.assertRedirects(
+            response, reverse('posts:profile', args=(USERNAME2,)))
+        response = Client().get(
+            reverse('posts:profile_export', args=(USERNAME,)))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,249 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Group, Post, User
+from yatube import metrics
+from yatube.middleware import StackSampler, profile_token
+
+USERNAME = 'testuser'
+METRICS_TOKEN = 'scrape-token'
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_PREGENERATE=False)
+class ServerTimingTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='test',
+            slug='test',
+            description='test group'
+        )
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        Post.objects.create(
+            text='Пост',
+            author=cls.user,
+            group=cls.group,
+            image=SimpleUploadedFile(name='small.gif', content=small_gif,
+                                     content_type='image/gif')
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request(self):
+        """Sampled request gets Server-Timing header and JSON log line."""
+        url = reverse('posts:group_posts', args=(self.group.slug,))
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            response = Client().get(url)
+        header = response['Server-Timing']
+        for metric in ('db;', 'tpl;', 'cache;', 'thumb;', 'total;'):
+            self.assertIn(metric, header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:group_posts')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_count'], 0)
+        self.assertGreater(record['cache_count'], 0)
+        self.assertEqual(record['tpl_count'], 1)
+        self.assertGreaterEqual(record['total_ms'], record['tpl_ms'])
+
+    def test_not_sampled_request(self):
+        """Without sampling there is no header."""
+        response = Client().get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class ProfilerTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir, True)
+
+    def profiles(self):
+        return sorted(os.listdir(self.profile_dir))
+
+    def test_signed_header(self):
+        """Request with valid token is profiled, invalid is not."""
+        with self.settings(PROFILE_DIR=self.profile_dir):
+            Client().get(reverse('posts:index'),
+                         HTTP_X_PROFILE_TOKEN='wrong')
+            self.assertEqual(self.profiles(), [])
+            response = Client().get(reverse('posts:index'),
+                                    HTTP_X_PROFILE_TOKEN=profile_token())
+        profiles = self.profiles()
+        self.assertEqual(profiles, [response['X-Profile-File']])
+        self.assertIn('-posts.index-', profiles[0])
+        self.assertTrue(profiles[0].endswith('.folded'))
+
+    def test_staff_param_cprofile(self):
+        """Staff ?profile=1 writes cProfile dump, other users can't."""
+        client = Client()
+        client.force_login(ProfilerTests.user)
+        staff_client = Client()
+        staff_client.force_login(ProfilerTests.staff)
+        url = reverse('posts:profile', args=(USERNAME,)) + '?profile=1'
+        with self.settings(PROFILE_DIR=self.profile_dir,
+                           PROFILE_FORMAT='cprofile'):
+            client.get(url)
+            self.assertEqual(self.profiles(), [])
+            staff_client.get(url)
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertIn('-posts.profile-', profiles[0])
+        stats = pstats.Stats(os.path.join(self.profile_dir, profiles[0]))
+        self.assertTrue(any(function == 'profile' for _, _, function
+                            in stats.stats))
+
+    def test_sample_every(self):
+        """Every N-th request is profiled."""
+        with self.settings(PROFILE_DIR=self.profile_dir,
+                           PROFILE_SAMPLE_EVERY=2):
+            client = Client()
+            for _ in range(4):
+                response = client.get(reverse('posts:index'))
+        self.assertEqual(len(self.profiles()), 2)
+        self.assertFalse(response.has_header('X-Profile-File'))
+
+    def test_stack_sampler(self):
+        """Sampler counts collapsed stacks of the thread."""
+        def slow_function():
+            time.sleep(0.05)
+
+        with StackSampler(threading.get_ident(), 0.001) as sampler:
+            slow_function()
+        stack, count = sampler.stacks.most_common(1)[0]
+        self.assertTrue(stack.endswith(f'{__name__}:slow_function'))
+        self.assertGreater(count, 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_PREGENERATE=False,
+                   METRICS_FLUSH_INTERVAL=0, METRICS_TOKEN=METRICS_TOKEN)
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        metrics.store.values = {}
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir, True)
+        settings_override = self.settings(METRICS_DIR=self.metrics_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(MetricsTests.user)
+
+    def scrape(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_and_cache(self):
+        """Latency, queries and fragment cache hits are exposed."""
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            text)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2', text)
+        self.assertIn('yatube_db_queries_count{view="posts:index"} 2', text)
+        self.assertIn(
+            'yatube_responses_total{status="200",view="posts:index"} 2',
+            text)
+        self.assertIn('yatube_cache_requests_total'
+                      '{cache="index_page",result="hit"} 1', text)
+        self.assertIn('yatube_cache_requests_total'
+                      '{cache="index_page",result="miss"} 1', text)
+
+    def test_processes_are_summed(self):
+        """Values of other worker processes are added."""
+        self.client.get(reverse('posts:index'))
+        other = [[['yatube_responses_total',
+                   [['status', '200'], ['view', 'posts:index']]], 5]]
+        with open(os.path.join(self.metrics_dir, '1.json'), 'w') as target:
+            json.dump(other, target)
+        self.assertIn(
+            'yatube_responses_total{status="200",view="posts:index"} 6',
+            self.scrape())
+
+    def test_uploads_and_thumbnails(self):
+        """Upload sizes and image variant time are exposed."""
+        buffer = BytesIO()
+        Image.new('RGB', (200, 100), 'red').save(buffer, 'JPEG')
+        self.authorized_client.post(reverse('posts:new_post'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile('red.jpg', buffer.getvalue(),
+                                        'image/jpeg'),
+        })
+        thumbnails.generate(Post.objects.get().pk)
+        text = self.scrape()
+        self.assertIn('yatube_upload_bytes_count{field="image"} 1', text)
+        self.assertIn('yatube_thumbnail_seconds_count{kind="variants"} 1',
+                      text)
+
+    def test_only_token_and_staff(self):
+        """Metrics are hidden without the token, also from local
+        addresses, and shown to staff."""
+        url = reverse('metrics')
+        for client, headers in (
+                (self.client, {}),
+                (self.client, {'HTTP_AUTHORIZATION': 'Bearer wrong'}),
+                (self.client, {'REMOTE_ADDR': '127.0.0.1'}),
+                (self.authorized_client, {})):
+            with self.subTest(headers=headers):
+                self.assertEqual(client.get(url, **headers).status_code, 404)
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer ')
+            self.assertEqual(response.status_code, 404)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.authorized_client.get(url).status_code, 200)
@@ -0,0 +1,93 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.urls import QUERY_BUDGETS
+
+USERNAME = 'testuser'
+USERNAME2 = 'followuser'
+SMALL = 2
+LARGE = 12
+
+
+@override_settings(THUMBNAIL_PREGENERATE=False)
+class QueryBudgetTests(TestCase):
+    """Every budgeted view makes the same number of queries, within
+    its budget, whatever the number of posts and comments."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        cls.author = User.objects.create(username=USERNAME2)
+        cls.group = Group.objects.create(
+            title='test',
+            slug='test',
+            description='test group'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(text='Пост со словом лес',
+                                       author=cls.author, group=cls.group)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTests.user)
+        self.size = 0
+
+    def grow(self, size):
+        """Add posts, each with comments of a new user, up to size."""
+        for number in range(self.size, size):
+            commenter = User.objects.create(username=f'commenter{number}')
+            Comment.objects.create(post=self.post, author=commenter,
+                                   text=f'Комментарий {number}')
+            post = Post.objects.create(text=f'Пост {number} про лес',
+                                       author=self.author, group=self.group)
+            Comment.objects.create(post=post, author=commenter,
+                                   text=f'Комментарий {number}')
+        self.size = size
+
+    def urls(self):
+        return {
+            'index': reverse('posts:index'),
+            'group_posts': reverse('posts:group_posts',
+                                   args=(self.group.slug,)),
+            'search': reverse('posts:search') + '?q=лес',
+            'profile': reverse('posts:profile', args=(USERNAME2,)),
+            'post': reverse('posts:post', args=(USERNAME2, self.post.pk)),
+            'follow_index': reverse('posts:follow_index'),
+            'api_index': reverse('posts:api_index'),
+            'api_group_posts': reverse('posts:api_group_posts',
+                                       args=(self.group.slug,)),
+            'api_profile': reverse('posts:api_profile', args=(USERNAME2,)),
+            'api_post': reverse('posts:api_post',
+                                args=(USERNAME2, self.post.pk)),
+            'api_follow_index': reverse('posts:api_follow_index'),
+            'post_comments': reverse('posts:post_comments',
+                                     args=(USERNAME2, self.post.pk)),
+        }
+
+    def count_queries(self):
+        counts = {}
+        for name, url in self.urls().items():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts[name] = len(queries)
+        return counts
+
+    def test_query_budgets(self):
+        """Views fit QUERY_BUDGETS at two data sizes."""
+        self.grow(SMALL)
+        small = self.count_queries()
+        self.grow(LARGE)
+        large = self.count_queries()
+        self.assertEqual(set(large), set(QUERY_BUDGETS))
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(view=name):
+                self.assertEqual(large[name], small[name],
+                                 'Number of queries grows with data')
+                self.assertLessEqual(large[name], budget)
@@ -0,0 +1,87 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+USERNAME = 'testuser'
+USERNAME2 = 'followuser'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite')
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        cls.author = User.objects.create(username=USERNAME2)
+        cls.group = Group.objects.create(
+            title='test',
+            slug='test',
+            description='test group'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for post_num in range(3):
+            post = Post.objects.create(text=f'Пост {post_num}',
+                                       author=cls.author,
+                                       group=cls.group)
+            Comment.objects.create(post=post, author=cls.user,
+                                   text=f'Комментарий {post_num}')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryPlanTests.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def main_queries(self, url, table):
+        """Return SQL of ordered queries to table made by the view."""
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return [query['sql'] for query in queries.captured_queries
+                if f'FROM "{table}"' in query['sql']
+                and 'ORDER BY' in query['sql']]
+
+    def test_listings_use_indexes(self):
+        """Main queries of the views read indexes instead of
+        sorting in a temp B-tree."""
+        post = QueryPlanTests.post
+        views = (
+            (reverse('posts:index'), 'posts_post'),
+            (reverse('posts:group_posts', args=(self.group.slug,)),
+             'posts_post'),
+            (reverse('posts:profile', args=(USERNAME2,)), 'posts_post'),
+            (reverse('posts:follow_index'), 'posts_post'),
+            (reverse('posts:post', args=(USERNAME2, post.id)),
+             'posts_comment'),
+        )
+        for url, table in views:
+            with self.subTest(url=url):
+                queries = self.main_queries(url, table)
+                self.assertTrue(queries)
+                for sql in queries:
+                    plan = self.explain(sql)
+                    self.assertNotIn('TEMP B-TREE', plan)
+                    self.assertIn('INDEX', plan)
+
+    def test_is_followed_uses_index(self):
+        """Follow lookup by author and user uses the unique constraint
+        index."""
+        sql, params = Follow.objects.filter(
+            author=QueryPlanTests.author, user=QueryPlanTests.user
+        ).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('INDEX', plan)
+        self.assertNotIn('SCAN', plan)
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TransactionTestCase,
+    override_settings
+)
+from django.urls import resolve, reverse
+
+from posts.models import Post, User
+from yatube import routers
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.middleware = routers.ReplicaMiddleware(lambda request: None)
+        self.addCleanup(setattr, routers._local, 'pinned', True)
+
+    def route(self, request):
+        request.resolver_match = resolve(request.path)
+        self.middleware.process_view(request, None, (), {})
+        return self.router.db_for_read(Post)
+
+    def test_listing_reads_go_to_replica(self):
+        """GET of listed views reads posts from replica, users from
+        primary."""
+        request = RequestFactory().get(reverse('posts:index'))
+        self.assertEqual(self.route(request), REPLICA)
+        self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+    def test_other_reads_go_to_primary(self):
+        """POST, other views and sticky users read from primary."""
+        factory = RequestFactory()
+        sticky = factory.get(reverse('posts:index'))
+        sticky.COOKIES[routers.STICKY_COOKIE] = str(time.time() + 60)
+        for request in (factory.post(reverse('posts:index')),
+                        factory.get(reverse('posts:new_post')),
+                        sticky):
+            with self.subTest(path=request.path, method=request.method):
+                self.assertEqual(self.route(request), DEFAULT_DB_ALIAS)
+
+    def test_write_pins_to_primary(self):
+        """Reads after a write in the same request go to primary."""
+        self.route(RequestFactory().get(reverse('posts:index')))
+        self.assertEqual(self.router.db_for_write(Post), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_no_migrations_on_replica(self):
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'posts'))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], THUMBNAIL_PREGENERATE=False)
+class ReplicaIntegrationTests(TransactionTestCase):
+    """Primary and replica are two SQLite databases, the replica is
+    updated by sync_replicas."""
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            **connections.databases[DEFAULT_DB_ALIAS],
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def sync(self):
+        call_command('sync_replicas', stdout=StringIO())
+
+    def index(self, client):
+        cache.clear()
+        return client.get(reverse('posts:index')).content.decode()
+
+    def test_read_your_writes(self):
+        author = User.objects.create(username='author')
+        Post.objects.create(text='Старый пост', author=author)
+        self.sync()
+        Post.objects.create(text='Пост после синхронизации', author=author)
+        anonymous = Client()
+        client = Client()
+        client.force_login(author)
+
+        page = self.index(anonymous)
+        self.assertIn('Старый пост', page)
+        self.assertNotIn('Пост после синхронизации', page)
+
+        response = client.post(reverse('posts:new_post'),
+                               {'text': 'Свой пост'})
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        page = self.index(client)
+        self.assertIn('Свой пост', page)
+        self.assertNotIn('Свой пост', self.index(anonymous))
+
+        self.sync()
+        self.assertIn('Пост после синхронизации', self.index(anonymous))
+
+        Post.objects.create(text='Ещё не на реплике', author=author)
+        client.cookies[routers.STICKY_COOKIE] = str(int(time.time()) - 1)
+        self.assertNotIn('Ещё не на реплике', self.index(client))
+
+    def test_replica_pages_not_cached(self):
+        """Pages read from a lagging replica are not cached under the
+        current version and get no ETag."""
+        author = User.objects.create(username='author')
+        Post.objects.create(text='Старый пост', author=author)
+        self.sync()
+        Post.objects.create(text='Пост после синхронизации', author=author)
+        urls = (reverse('posts:index'), reverse('posts:posts_rss'),
+                reverse('posts:api_index'))
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Старый пост')
+                self.assertNotContains(response, 'Пост после синхронизации')
+                self.assertNotIn('ETag', response)
+        self.sync()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url),
+                                    'Пост после синхронизации')
@@ -0,0 +1,83 @@
+import datetime as dt
+
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+USERNAME = 'testuser'
+USERNAME2 = 'otheruser'
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.other = User.objects.create_user(username=USERNAME2)
+        cls.group = Group.objects.create(
+            title='test',
+            slug='test',
+            description='test group'
+        )
+        cls.rare = Post.objects.create(
+            text='Сибирский кот и сибирский лес',
+            author=cls.user,
+            group=cls.group
+        )
+        cls.common = Post.objects.create(
+            text='Сибирский тракт длинный, очень длинный и пыльный',
+            author=cls.other
+        )
+        Post.objects.create(text='Про другое', author=cls.user)
+        cls.url = reverse('posts:search')
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'))
+
+    def search(self, **params):
+        response = self.client.get(SearchTests.url, params)
+        return list(response.context['page'])
+
+    def test_search_ranks_posts(self):
+        """Search finds posts by word prefixes, more relevant first."""
+        self.assertEqual(self.search(q='сибирск'),
+                         [SearchTests.rare, SearchTests.common])
+        self.assertEqual(self.search(q='сибирский лес'), [SearchTests.rare])
+
+    def test_search_filters(self):
+        """Search results are filtered by group, author and dates."""
+        self.assertEqual(self.search(q='сибирский', group='test'),
+                         [SearchTests.rare])
+        self.assertEqual(self.search(q='сибирский', author=USERNAME2),
+                         [SearchTests.common])
+        tomorrow = timezone.localdate() + dt.timedelta(days=1)
+        self.assertEqual(self.search(q='сибирский', date_from=tomorrow), [])
+
+    def test_search_follows_edits(self):
+        """Index follows edited and deleted posts."""
+        post = Post.objects.get(pk=SearchTests.common.pk)
+        post.text = 'Уральский тракт'
+        post.save()
+        self.assertEqual(self.search(q='уральский'), [post])
+        self.assertEqual(self.search(q='сибирский'), [SearchTests.rare])
+        post.delete()
+        self.assertEqual(self.search(q='уральский'), [])
+
+    def test_search_odd_queries(self):
+        """Queries without words or with FTS syntax find nothing
+        or work as plain words."""
+        self.assertEqual(self.search(q='"*:()'), [])
+        self.assertEqual(self.search(q='"лес*:'), [SearchTests.rare])
+        self.assertEqual(self.search(), [])
+
+    def test_admin_search(self):
+        """Posts admin searches by the full-text index."""
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'лес'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [SearchTests.rare])
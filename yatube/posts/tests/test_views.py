@@ -1,14 +1,27 @@
+import base64
+import json
+import os
 import shutil
 import tempfile
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
 
+from posts import caching, thumbnails
 from posts.forms import PostForm
-from posts.models import Follow, Group, Post, User
+from posts.images import variant_name, variant_widths
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserStats)
+from posts.tests.utils import on_commit_callbacks
 
 USERNAME = 'testuser'
 USERNAME2 = 'followuser'
@@ -16,6 +29,11 @@ POSTTEXT = 'Тут текст нового поста'
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def cursor_token(data):
+    """Return cursor token with arbitrary JSON data."""
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostPagesTests(TestCase):
 
@@ -176,23 +194,43 @@ class PostPagesTests(TestCase):
         self.assertEqual(len(response.context['page']), 0)
 
     def test_cache_index(self):
-        """Index page must be cached with complex key."""
+        """Index page is cached until its content changes."""
         post = Post.objects.create(
             text='Тест кэшированного поста ',
             author=PostPagesTests.user
         )
         response = self.client.get(PostPagesTests.index)
-        before_del = response.content.decode('utf-8')
+        before_update = response.content.decode('utf-8')
 
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
         response = self.client.get(PostPagesTests.index)
-        after_del = response.content.decode('utf-8')
-        self.assertEqual(before_del, after_del)
+        after_update = response.content.decode('utf-8')
+        self.assertEqual(before_update, after_update)
 
-        cache.clear()
+        with on_commit_callbacks():
+            post.delete()
+            response = self.client.get(PostPagesTests.index)
+            self.assertEqual(response.content.decode('utf-8'), after_update)
         response = self.client.get(PostPagesTests.index)
-        after_clean_cache = response.content.decode('utf-8')
-        self.assertNotEqual(after_clean_cache, after_del)
+        after_del = response.content.decode('utf-8')
+        self.assertNotEqual(after_del, after_update)
+        self.assertNotIn('Тест кэшированного поста', after_del)
+
+    def test_cache_listing_per_viewer(self):
+        """Edit links of the author's cached index and group pages
+        don't leak to other users."""
+        edit_url = reverse('posts:post_edit',
+                           args=(USERNAME, PostPagesTests.post.id))
+        for url in (PostPagesTests.index, PostPagesTests.group_post):
+            response = self.authorized_client.get(url)
+            self.assertContains(response, edit_url)
+        other_client = Client()
+        other_client.force_login(User.objects.create(username=USERNAME2))
+        for client in (other_client, self.client):
+            for url in (PostPagesTests.index, PostPagesTests.group_post):
+                with self.subTest(url=url):
+                    response = client.get(url)
+                    self.assertNotContains(response, edit_url)
 
     def test_auth_user_can_follow(self):
         """Authorized user can follow other users."""
@@ -247,3 +285,289 @@ class PostPagesTests(TestCase):
         response = auth_not_follow_client.get(self.follow)
         self.assertIn('page', response.context)
         self.assertEqual(len(response.context['page'].object_list), 0)
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Following fills timeline with author posts,
+        unfollowing removes them."""
+        author = User.objects.create(username=USERNAME2)
+        old_post = Post.objects.create(text='Старый пост', author=author)
+        self.authorized_client.get(self.profile_follow)
+        response = self.authorized_client.get(self.follow)
+        self.assertEqual(list(response.context['page']), [old_post])
+
+        self.authorized_client.get(self.profile_unfollow)
+        self.assertFalse(PostPagesTests.user.timeline.exists())
+        response = self.authorized_client.get(self.follow)
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_rebuild_timelines_command(self):
+        """rebuild_timelines restores timelines from follows."""
+        author = User.objects.create(username=USERNAME2)
+        Follow.objects.create(user=PostPagesTests.user, author=author)
+        posts = [Post.objects.create(text=f'Пост {num}', author=author)
+                 for num in range(3)]
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        response = self.authorized_client.get(self.follow)
+        self.assertEqual(list(response.context['page']), posts[::-1])
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_cursor_pagination(self):
+        """Cursor pages go forward and back without gaps or repeats."""
+        number_of_posts = 13
+        for post_num in range(number_of_posts):
+            Post.objects.create(text=f'Курсор {post_num}',
+                                author=PostPagesTests.user)
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        first = self.client.get(PostPagesTests.index).context['page']
+        self.assertEqual(list(first), expected[:settings.POST_PER_PAGE])
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            PostPagesTests.index, {'cursor': first.next_cursor}
+        ).context['page']
+        self.assertEqual(list(second), expected[settings.POST_PER_PAGE:])
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            PostPagesTests.index, {'cursor': second.previous_cursor}
+        ).context['page']
+        self.assertEqual(list(back), list(first))
+        for cursor in ('not-a-cursor', cursor_token(['n', [None, None]]),
+                       cursor_token(['n', ['2020-01-01T00:00:00',
+                                           10 ** 30]])):
+            with self.subTest(cursor=cursor):
+                broken = self.client.get(
+                    PostPagesTests.index, {'cursor': cursor}
+                ).context['page']
+                self.assertEqual(list(broken), list(first))
+
+    @override_settings(COMMENTS_PER_PAGE=3)
+    def test_comments_load_more(self):
+        """Post page shows first comments, 'load more' returns the rest
+        as HTML fragments."""
+        Comment.objects.bulk_create(
+            Comment(post=PostPagesTests.post, author=PostPagesTests.user,
+                    text=f'Комментарий {number}')
+            for number in range(5)
+        )
+        expected = list(PostPagesTests.post.comments.order_by('-created',
+                                                              '-id'))
+        response = self.client.get(PostPagesTests.single_post)
+        page = response.context['comments_page']
+        self.assertEqual(list(page), expected[:3])
+        self.assertContains(response, 'comments-more')
+        more = self.client.get(
+            reverse('posts:post_comments',
+                    args=(USERNAME, PostPagesTests.post.id)),
+            {'cursor': page.next_cursor})
+        self.assertTemplateUsed(more, 'includes/comment_list.html')
+        self.assertEqual(list(more.context['comments_page']), expected[3:])
+        self.assertContains(more, expected[4].text)
+        self.assertNotContains(more, 'comments-more')
+        fallback = self.client.get(PostPagesTests.single_post,
+                                   {'comments': page.next_cursor})
+        self.assertEqual(list(fallback.context['comments_page']),
+                         expected[3:])
+        broken = cursor_token(['n', [None, 10 ** 30]])
+        response = self.client.get(PostPagesTests.single_post,
+                                   {'comments': broken})
+        self.assertEqual(list(response.context['comments_page']),
+                         expected[:3])
+        more = self.client.get(
+            reverse('posts:post_comments',
+                    args=(USERNAME, PostPagesTests.post.id)),
+            {'cursor': broken})
+        self.assertEqual(list(more.context['comments_page']), expected[:3])
+
+    def test_profile_card_stats(self):
+        """Profile card counters follow posts and follows
+        and are repaired by repair_user_stats."""
+        author = User.objects.create(username=USERNAME2)
+        Post.objects.create(text='Пост автора', author=author)
+        self.authorized_client.get(self.profile_follow)
+        profile = reverse('posts:profile', args=(USERNAME2,))
+        stats = self.client.get(profile).context['author'].stats
+        self.assertEqual((stats.followers_count, stats.following_count,
+                          stats.posts_count), (1, 0, 1))
+
+        UserStats.objects.filter(user=author).update(posts_count=7)
+        call_command('repair_user_stats', stdout=StringIO())
+        self.authorized_client.get(self.profile_unfollow)
+        stats = self.client.get(profile).context['author'].stats
+        self.assertEqual((stats.followers_count, stats.following_count,
+                          stats.posts_count), (0, 0, 1))
+        self.assertEqual(
+            UserStats.objects.get(user=PostPagesTests.user).following_count,
+            0)
+
+    def test_version_cache_shared(self):
+        """Versions are kept in a cache shared by workers, a per-process
+        cache gives a warning and short-lived fragments."""
+        self.assertTrue(caching.is_shared())
+        self.assertEqual(caching.check_version_cache(None), [])
+        with override_settings(VERSION_CACHE='default'):
+            self.assertEqual(
+                [warning.id for warning in caching.check_version_cache(None)],
+                ['posts.W001'])
+            self.assertEqual(caching.fragment_timeout(),
+                             caching.PROCESS_CACHE_TIMEOUT)
+
+    def test_cache_group_and_profile_invalidation(self):
+        """Group and profile pages are invalidated only by changes
+        of their own posts and comments."""
+        group2 = Group.objects.create(title='test2', slug='test2',
+                                      description='test group 2')
+        author = User.objects.create(username=USERNAME2)
+        post = Post.objects.create(text='Пост в группе', author=author,
+                                   group=group2)
+        urls = {
+            'group': PostPagesTests.group_post,
+            'group2': reverse('posts:group_posts', args=(group2.slug,)),
+            'profile': PostPagesTests.profile,
+            'profile2': reverse('posts:profile', args=(USERNAME2,)),
+        }
+
+        def versions():
+            return {
+                'group': caching.get_version(
+                    caching.group_scope(PostPagesTests.group.pk)),
+                'group2': caching.get_version(caching.group_scope(group2.pk)),
+                'profile': caching.get_version(
+                    caching.author_scope(PostPagesTests.user.pk)),
+                'profile2': caching.get_version(
+                    caching.author_scope(author.pk)),
+            }
+
+        for url in urls.values():
+            self.client.get(url)
+        before = versions()
+        with on_commit_callbacks():
+            Comment.objects.create(post=post, author=author, text='Коммент')
+        after_comment = versions()
+        for name in ('group', 'profile'):
+            with self.subTest(name=name):
+                self.assertEqual(before[name], after_comment[name])
+        for name in ('group2', 'profile2'):
+            with self.subTest(name=name):
+                self.assertNotEqual(before[name], after_comment[name])
+        response = self.client.get(urls['group2'])
+        self.assertContains(response, 'Комментариев: 1')
+
+        post.group = PostPagesTests.group
+        with on_commit_callbacks():
+            post.save()
+        after_move = versions()
+        self.assertNotEqual(after_comment['group'], after_move['group'])
+        self.assertNotEqual(after_comment['group2'], after_move['group2'])
+        response = self.client.get(urls['group2'])
+        self.assertNotContains(response, 'Пост в группе')
+
+    def test_conditional_get(self):
+        """Unchanged pages are answered with 304 Not Modified."""
+        urls = (PostPagesTests.index, PostPagesTests.group_post,
+                PostPagesTests.profile, PostPagesTests.single_post)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotIn('Last-Modified', response)
+                etag = response['ETag']
+                response = self.authorized_client.get(
+                    url,
+                    HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        etags = {url: self.authorized_client.get(url)['ETag']
+                 for url in urls}
+        with on_commit_callbacks():
+            Comment.objects.create(post=PostPagesTests.post,
+                                   author=PostPagesTests.user,
+                                   text='Новый комментарий')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_thumbnails_pregenerated(self):
+        """Post image variants are generated out of request, keep
+        the whole image and are used by the post card."""
+        with mock.patch('posts.views.thumbnails.enqueue') as enqueue:
+            self.authorized_client.post(
+                PostPagesTests.new_post,
+                data={'text': 'Пост с картинкой',
+                      'image': SimpleUploadedFile(
+                          'thumb.gif', PostPagesTests.uploaded.file.getvalue(),
+                          content_type='image/gif')})
+        post = Post.objects.get(text='Пост с картинкой')
+        enqueue.assert_called_once_with(post)
+
+        self.assertTrue(thumbnails.generate(post.pk))
+        post.refresh_from_db()
+        self.assertEqual(variant_widths(post),
+                         sorted(settings.POST_IMAGE_WIDTHS, reverse=True))
+        response = self.client.get(PostPagesTests.index)
+        for width in settings.POST_IMAGE_WIDTHS:
+            for ext in ('webp', 'jpg'):
+                with self.subTest(width=width, ext=ext):
+                    name = variant_name(post.image.name, width, ext)
+                    self.assertTrue(post.image.storage.exists(name))
+                    self.assertContains(
+                        response, f'{post.image.storage.url(name)} {width}w')
+        with Image.open(post.image.storage.path(
+                variant_name(post.image.name, 480, 'webp'))) as variant:
+            self.assertEqual(variant.format, 'WEBP')
+            self.assertEqual(variant.size, (480, 240))
+
+    def test_thumbnail_job_keeps_media_root(self):
+        """Queued job writes to MEDIA_ROOT of the request which queued
+        it, even if the setting changed before it runs."""
+        post = PostPagesTests.post
+        with override_settings(THUMBNAIL_PREGENERATE=True), mock.patch(
+                'posts.thumbnails.get_executor') as get_executor:
+            with on_commit_callbacks():
+                thumbnails.enqueue(post)
+        job, post_id, storage = get_executor().submit.call_args[0]
+        other_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_root, True)
+        with override_settings(MEDIA_ROOT=other_root):
+            self.assertTrue(job(post_id, storage))
+        self.assertEqual(os.listdir(other_root), [])
+        self.assertTrue(post.image.storage.exists(
+            variant_name(post.image.name, 480, 'webp')))
+
+    def test_pregenerate_missing_thumbnails(self):
+        """Command generates variants only of images which lack them,
+        all of them with --all."""
+        ready = Post.objects.create(text='Готовый', author=self.user,
+                                    image=PostPagesTests.post.image.name,
+                                    image_widths='480')
+        Post.objects.create(text='Без картинки', author=self.user)
+        with mock.patch('posts.thumbnails.generate',
+                        return_value=True) as generate:
+            call_command('pregenerate_thumbnails', stdout=StringIO())
+            generate.assert_called_once_with(PostPagesTests.post.pk)
+            generate.reset_mock()
+            call_command('pregenerate_thumbnails', '--all',
+                         stdout=StringIO())
+            self.assertEqual(
+                sorted(call[0][0] for call in generate.call_args_list),
+                [PostPagesTests.post.pk, ready.pk])
+
+    def test_thumbnail_fallback(self):
+        """Sorl thumbnail is pregenerated if variants fail."""
+        with mock.patch('posts.thumbnails.images.make_variants',
+                        side_effect=OSError):
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                self.assertTrue(thumbnails.generate(PostPagesTests.post.pk))
+        thumbnail = get_thumbnail(PostPagesTests.post.image,
+                                  thumbnails.POST_GEOMETRY,
+                                  **thumbnails.POST_OPTIONS)
+        self.assertTrue(thumbnail.exists())
+        response = self.client.get(PostPagesTests.index)
+        self.assertContains(response, thumbnail.url)
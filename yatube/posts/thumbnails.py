@@ -0,0 +1,101 @@
+"""Background generation of post image thumbnails.
+
+Thumbnails are made right after a post with image is saved, by a
+local thread pool, so visitors never wait for decoding and resizing
+of the original image. Responsive variants (posts.images) are made
+first; sorl thumbnail is the fallback if they can't be made.
+Geometry and options must match the thumbnail tag in
+includes/post_item.html to hit the same thumbnail. Jobs keep the
+storage location of the request which queued them, as settings may
+change before they run, e.g. MEDIA_ROOT overridden in tests.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import get_thumbnail
+
+from posts import caching, images
+from posts.models import Post
+
+POST_GEOMETRY = '960x339'
+POST_OPTIONS = {'crop': 'noop', 'upscale': True}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def generate(post_id, storage=None):
+    """Make responsive variants or thumbnail of the post image in
+    storage, by default in the storage of the image field.
+    Return True on success."""
+    try:
+        post = Post.objects.only(
+            'image', 'author_id', 'group_id').filter(pk=post_id).first()
+        if post is None or not post.image:
+            return False
+        if storage is not None:
+            post.image.storage = storage
+        try:
+            widths = images.make_variants(post.image)
+        except Exception:
+            logger.exception('Image variants failed for post %s', post_id)
+            get_thumbnail(post.image, POST_GEOMETRY, **POST_OPTIONS)
+            return True
+        Post.objects.filter(pk=post_id, image=post.image.name).update(
+            image_widths=','.join(str(width) for width in widths))
+        caching.bump_version(*caching.post_scopes(post.author_id,
+                                                  post.group_id))
+        return True
+    except Exception:
+        logger.exception('Thumbnail generation failed for post %s', post_id)
+        return False
+    finally:
+        with _lock:
+            _pending.discard(post_id)
+        close_old_connections()
+
+
+def enqueue(post):
+    """Generate thumbnail of the post in background after commit."""
+    if not settings.THUMBNAIL_PREGENERATE or not post.image:
+        return
+    storage = _resolved(post.image.storage)
+    transaction.on_commit(lambda: _submit(post.pk, storage))
+
+
+def _submit(post_id, storage):
+    with _lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+    get_executor().submit(generate, post_id, storage)
+
+
+def _resolved(storage):
+    """Return storage fixed to its current location: the default
+    storage follows later changes of MEDIA_ROOT."""
+    if isinstance(storage, FileSystemStorage):
+        return FileSystemStorage(
+            location=storage.location,
+            base_url=storage.base_url,
+            file_permissions_mode=storage.file_permissions_mode,
+            directory_permissions_mode=storage.directory_permissions_mode)
+    return storage
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+    return _executor
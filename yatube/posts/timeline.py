@@ -0,0 +1,94 @@
+"""Materialized home timelines for the follow page.
+
+Each follower gets a TimelineEntry row per post of every followed
+author, so the follow page is a single range read by user.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from posts.models import Follow, Post, TimelineEntry
+
+
+def fan_out_post(post):
+    """Add new post to timelines of all followers of its author."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    entries = (TimelineEntry(user_id=user_id,
+                             post_id=post.pk,
+                             pub_date=post.pub_date)
+               for user_id in followers)
+    _bulk_insert(entries)
+
+
+def backfill(follow):
+    """Add all posts of followed author to the follower timeline."""
+    posts = Post.objects.filter(
+        author_id=follow.author_id
+    ).values_list('pk', 'pub_date').iterator()
+    entries = (TimelineEntry(user_id=follow.user_id,
+                             post_id=post_id,
+                             pub_date=pub_date)
+               for post_id, pub_date in posts)
+    _bulk_insert(entries)
+
+
+def prune(follow):
+    """Remove posts of unfollowed author from the follower timeline."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        post__author_id=follow.author_id
+    ).delete()
+
+
+def fan_out_posts(post_ids):
+    """Add posts inserted by bulk_create to timelines of followers of
+    their authors."""
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    _insert_entries(f'p.id IN ({placeholders})', post_ids)
+
+
+def backfill_follows(follows):
+    """Add all posts of followed authors to timelines of followers for
+    (user_id, author_id) pairs of follows inserted by bulk_create."""
+    condition = ' OR '.join(['(f.user_id = %s AND f.author_id = %s)']
+                            * len(follows))
+    _insert_entries(condition,
+                    [pk for follow in follows for pk in follow])
+
+
+def rebuild():
+    """Rebuild all timelines from Follow and Post tables.
+    Return number of created entries."""
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        _insert_entries()
+    return TimelineEntry.objects.count()
+
+
+def _insert_entries(condition=None, params=()):
+    """Insert entries of followers and posts of followed authors
+    matching SQL condition on f (Follow) and p (Post), skipping
+    existing entries."""
+    ops = connection.ops
+    where = f'WHERE {condition} ' if condition else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{TimelineEntry._meta.db_table} '
+            '(user_id, post_id, pub_date) '
+            'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'INNER JOIN {Post._meta.db_table} p '
+            f'ON p.author_id = f.author_id {where}'
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            params
+        )
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
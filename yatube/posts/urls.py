@@ -1,16 +1,49 @@
 from django.urls import path
 
-from posts import views
+from posts import api, feeds, views
 
 app_name = 'posts'
 
+# Maximum number of SQL queries of a page for a logged in user with cold
+# cache, regardless of the number of posts and comments. Checked by
+# posts/tests/test_query_budgets.py.
+QUERY_BUDGETS = {
+    'index': 4,
+    'group_posts': 6,
+    'search': 5,
+    'profile': 7,
+    'post': 5,
+    'follow_index': 4,
+    'api_index': 3,
+    'api_group_posts': 5,
+    'api_profile': 5,
+    'api_post': 5,
+    'api_follow_index': 3,
+    'post_comments': 5,
+}
+
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path('group/<slug:slug>/rss/', feeds.group_rss, name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.group_atom, name='group_atom'),
+    path('rss/', feeds.posts_rss, name='posts_rss'),
+    path('atom/', feeds.posts_atom, name='posts_atom'),
     path('follow/', views.follow_index, name='follow_index'),
     path('new/', views.new_post, name='new_post'),
+    path('search/', views.search, name='search'),
+    path('api/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_posts'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    path('api/<str:username>/', api.profile, name='api_profile'),
+    path('api/<str:username>/<int:post_id>/', api.post_view,
+         name='api_post'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path('<str:username>/rss/', feeds.author_rss, name='author_rss'),
+    path('<str:username>/atom/', feeds.author_atom, name='author_atom'),
+    path('<str:username>/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('<str:username>/<int:post_id>/comment/',
          views.add_comment, name="add_comment"),
     path('<str:username>/<int:post_id>/edit/', views.post_edit,
@@ -19,4 +52,6 @@ urlpatterns = [
          name='profile_follow'),
     path('<str:username>/unfollow/', views.profile_unfollow,
          name='profile_unfollow'),
+    path('<str:username>/export/', views.profile_export,
+         name='profile_export'),
 ]
@@ -3,39 +3,115 @@ from http import HTTPStatus
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
-from posts.forms import CommentForm, PostForm
+from posts import caching, export, thumbnails
+from posts.forms import CommentForm, PostForm, SearchForm
 from posts.models import Follow, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.search import search_posts
 
 
-def get_paginator_page(request, posts):
+def get_paginator_page(request, posts, mode=None):
     """Return pages from posts with POST_PER_PAGE (from settings)
-    post on each."""
+    post on each. With PAGINATION_MODE = 'cursor' pages are addressed
+    by ?cursor= tokens instead of page numbers."""
+    if (mode or settings.PAGINATION_MODE) == 'cursor':
+        paginator = CursorPaginator(posts, settings.POST_PER_PAGE)
+        return paginator.get_page(request.GET.get('cursor'))
     paginator = Paginator(posts, settings.POST_PER_PAGE)
     num_pages = request.GET.get('page')
     return paginator.get_page(num_pages)
 
 
+def index_scopes(request):
+    return (caching.INDEX,)
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    if group_id is None:
+        return None
+    return (caching.group_scope(group_id),)
+
+
+def profile_scopes(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    return (caching.author_scope(author_id),
+            caching.profile_scope(author_id))
+
+
+def post_scopes(request, username, post_id):
+    author_id = Post.objects.filter(
+        author__username=username,
+        pk=post_id).values_list('author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return (caching.author_scope(author_id),
+            caching.profile_scope(author_id))
+
+
+@caching.conditional(index_scopes)
 def index(request):
     """Return index page with last posts, ordered by date DESC."""
     all_posts = Post.objects.select_related(
         'author', 'group'
-    ).prefetch_related('comments')
+    )
     page = get_paginator_page(request, all_posts)
     return render(request, 'posts/index.html',
-                  {'page': page})
+                  {'page': page,
+                   'cache_timeout': caching.fragment_timeout(),
+                   'version': caching.get_version(caching.INDEX),
+                   })
 
 
+@caching.conditional(group_scopes)
 def group_posts(request, slug):
     """Return page with last group posts, ordered by date DESC."""
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts_group.select_related(
         'author'
-    ).prefetch_related('comments')
+    )
     page = get_paginator_page(request, posts)
+    version = caching.get_version(caching.group_scope(group.pk))
     return render(request, 'posts/group.html',
-                  {'group': group, 'page': page})
+                  {'group': group,
+                   'page': page,
+                   'cache_timeout': caching.fragment_timeout(),
+                   'version': version,
+                   })
+
+
+def search(request):
+    """Return page with posts found by text, ordered by relevance."""
+    form = SearchForm(request.GET or None)
+    posts = Post.objects.none()
+    if form.is_valid():
+        data = form.cleaned_data
+        posts = Post.objects.select_related('author', 'group')
+        if data['group']:
+            posts = posts.filter(group=data['group'])
+        if data['author']:
+            posts = posts.filter(author__username=data['author'])
+        if data['date_from']:
+            posts = posts.filter(pub_date__date__gte=data['date_from'])
+        if data['date_to']:
+            posts = posts.filter(pub_date__date__lte=data['date_to'])
+        posts = search_posts(posts, data['q'])
+    page = get_paginator_page(request, posts, mode='page')
+    query = request.GET.copy()
+    query.pop('page', None)
+    return render(request, 'posts/search.html',
+                  {'form': form,
+                   'page': page,
+                   'query': query.urlencode(),
+                   })
 
 
 @login_required
@@ -48,38 +124,69 @@ def new_post(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    thumbnails.enqueue(post)
     return redirect('posts:index')
 
 
+@caching.conditional(profile_scopes)
 def profile(request, username):
     """Return profile page with posts of 'username'."""
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
     posts = author.posts_author.select_related(
         'group'
-    ).prefetch_related('comments')
+    )
     page = get_paginator_page(request, posts)
     follow = is_followed(request, author)
+    version = caching.get_version(caching.author_scope(author.pk))
     return render(request, 'posts/profile.html',
                   {'page': page,
                    'author': author,
                    'follow': follow,
+                   'is_owner': request.user == author,
+                   'cache_timeout': caching.fragment_timeout(),
+                   'version': version,
                    })
 
 
+@caching.conditional(post_scopes)
 def post_view(request, username, post_id):
     """Return post page with 'post_id' = post_id ."""
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        author__username=username, pk=post_id)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
     return render(
         request, 'posts/post.html',
         {'post': post,
          'author': post.author,
          'form': form,
-         'comments': comments,
+         'comments_page': get_comments_page(comments,
+                                            request.GET.get('comments')),
          })
 
 
+@caching.conditional(post_scopes)
+def post_comments(request, username, post_id):
+    """Return next comments of post as HTML fragment for 'load more'."""
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             author__username=username, pk=post_id)
+    comments = post.comments.select_related('author')
+    return render(request, 'includes/comment_list.html',
+                  {'post': post,
+                   'comments_page': get_comments_page(
+                       comments, request.GET.get('cursor')),
+                   })
+
+
+def get_comments_page(comments, cursor):
+    """Return COMMENTS_PER_PAGE comments after cursor, newest first."""
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                                ordering=('-created', '-id'))
+    return paginator.get_page(cursor)
+
+
 @login_required
 def post_edit(request, username, post_id):
     """Show form with the edited post and save valid post into db."""
@@ -94,7 +201,11 @@ def post_edit(request, username, post_id):
     if not form.is_valid():
         return render(request, 'posts/edit.html',
                       {'form': form, 'post': post})
+    if 'image' in form.changed_data:
+        post.image_widths = ''
     form.save()
+    if 'image' in form.changed_data:
+        thumbnails.enqueue(post)
     return redirect('posts:post',
                     username=request.user.username,
                     post_id=post_id)
@@ -109,7 +220,8 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post',
                     username=username,
                     post_id=post_id)
@@ -127,8 +239,11 @@ def is_followed(request, author):
 @login_required
 def follow_index(request):
     """Show posts of users which request user follow."""
-    user = request.user
-    posts = Post.objects.filter(author__following__user=user)
+    posts = Post.objects.filter(
+        timeline_entries__user=request.user
+    ).select_related(
+        'author', 'group'
+    ).order_by('-timeline_entries__pub_date')
     page = get_paginator_page(request, posts)
     return render(request, 'posts/follow.html', {'page': page})
 
@@ -154,6 +269,23 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@login_required
+def profile_export(request, username):
+    """Stream zip archive with posts, comments and follows
+    of request user."""
+    if request.user.username != username:
+        return redirect('posts:profile', username=username)
+    files = (
+        (f'{name}.jsonl', export.jsonl(export.rows(name, queryset)))
+        for name, queryset in export.user_querysets(request.user).items()
+    )
+    response = StreamingHttpResponse(export.zip_stream(files),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{username}.zip"')
+    return response
+
+
 def page_not_found(request, exception):
     """Return 404 error page."""
     return render(
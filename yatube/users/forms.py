@@ -1,10 +1,38 @@
+import re
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
+from django.urls import get_resolver
 
 User = get_user_model()
 
 
+def reserved_usernames():
+    """Return first segments of site URLs like api/ or rss/, which
+    would shadow profile pages <username>/ of users with these names."""
+    return set(_url_segments(get_resolver().url_patterns))
+
+
+def _url_segments(patterns, prefix=''):
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if hasattr(pattern, 'url_patterns'):
+            yield from _url_segments(pattern.url_patterns, route)
+            continue
+        segment = route.split('/', 1)[0]
+        if re.fullmatch(r'[\w.@+-]+', segment):
+            yield segment
+
+
 class CreationForm(UserCreationForm):
     class Meta:
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username in reserved_usernames():
+            raise ValidationError('Это имя занято адресом на сайте.',
+                                  code='reserved_username')
+        return username
@@ -0,0 +1,306 @@
+"""Prometheus metrics.
+
+Every worker process keeps its counters and histograms in memory and
+writes them to METRICS_DIR/<pid>.json at most every
+METRICS_FLUSH_INTERVAL seconds. The /metrics view sums the files of all
+workers, so the scrape shows the whole server, not the process which
+happened to answer. METRICS_DIR None disables metrics. The view is
+served to staff users and to scrapers sending the METRICS_TOKEN
+setting as a bearer token (Authorization: Bearer <token>).
+
+Collected:
+- latency, status and SQL query count of requests by URL name;
+- hits and misses of template fragment caches (by fragment name) and
+  other caches (by key prefix);
+- time of image variants and sorl thumbnails;
+- sizes of uploaded files.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+FRAGMENT_PREFIX = 'template.cache.'
+
+# Name: (type, help, buckets).
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Request latency by URL name.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'yatube_responses_total': (
+        'counter', 'Responses by URL name and status.', None),
+    'yatube_db_queries': (
+        'histogram', 'SQL queries per request by URL name.',
+        (1, 2, 3, 5, 8, 13, 21, 50, 100, 500)),
+    'yatube_cache_requests_total': (
+        'counter', 'Cache reads by cache and result (hit or miss).', None),
+    'yatube_thumbnail_seconds': (
+        'histogram', 'Time of image variants and sorl thumbnails.',
+        (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'yatube_upload_bytes': (
+        'histogram', 'Size of uploaded files by form field.',
+        (10 ** 4, 10 ** 5, 5 * 10 ** 5, 10 ** 6, 5 * 10 ** 6, 10 ** 7,
+         5 * 10 ** 7)),
+}
+
+
+class Store:
+    """Metric values of this process. Histogram values are
+    [count per bucket..., count above buckets, sum]."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.values = {}
+        self.flushed = 0
+
+    def _check_pid(self):
+        # Worker forked from a master which already had values.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.values = {}
+
+    def inc(self, name, labels, amount=1):
+        key = _key(name, labels)
+        with self.lock:
+            self._check_pid()
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = _key(name, labels)
+        with self.lock:
+            self._check_pid()
+            histogram = self.values.get(key)
+            if histogram is None:
+                histogram = self.values[key] = [0] * (len(buckets) + 2)
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and time.monotonic() - self.flushed >= (
+                settings.METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        """Write values of this process to the shared directory."""
+        directory = settings.METRICS_DIR
+        with self.lock:
+            self._check_pid()
+            data = json.dumps(list(self.values.items()))
+            self.flushed = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.pid}.json')
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as target:
+            target.write(data)
+        os.replace(temp_path, path)
+
+
+store = Store()
+
+
+def collect():
+    """Return values summed over the files of all processes."""
+    values = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        try:
+            with open(path) as source:
+                items = json.load(source)
+        except (OSError, ValueError):
+            continue
+        for (name, labels), value in items:
+            key = (name, tuple(map(tuple, labels)))
+            if isinstance(value, list):
+                total = values.setdefault(key, [0] * len(value))
+                for index, number in enumerate(value):
+                    total[index] += number
+            else:
+                values[key] = values.get(key, 0) + value
+    return values
+
+
+def exposition(values):
+    """Return values in Prometheus text format."""
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for (key_name, labels), value in sorted(values.items()):
+            if key_name != name:
+                continue
+            if metric_type == 'counter':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket'
+                             f'{_labels(labels + (("le", bound),))} '
+                             f'{cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Return metrics of all workers to staff and token holders."""
+    if not settings.METRICS_DIR or not _is_allowed(request):
+        raise Http404
+    store.flush()
+    return HttpResponse(exposition(collect()),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
+
+
+def _is_allowed(request):
+    token = settings.METRICS_TOKEN
+    scheme, _, value = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and constant_time_compare(
+            value.strip(), token):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def cache_name(key):
+    """Return bounded label of the cache key: fragment name for
+    template fragments, 'app:kind' prefix for keys like
+    'posts:version:index', 'other' for the rest."""
+    if key.startswith(FRAGMENT_PREFIX):
+        return key[len(FRAGMENT_PREFIX):].split('.', 1)[0]
+    parts = key.split(':')
+    if len(parts) > 2:
+        return ':'.join(parts[:2])
+    return 'other'
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, *args, **kwargs):
+        value = get(self, key, *args, **kwargs)
+        if isinstance(key, str):
+            store.inc('yatube_cache_requests_total', {
+                'cache': cache_name(key),
+                'result': 'miss' if value is None else 'hit',
+            })
+        return value
+    wrapper.metrics_hook = True
+    return wrapper
+
+
+def _observe_variants(duration):
+    store.observe('yatube_thumbnail_seconds', {'kind': 'variants'},
+                  duration)
+    store.maybe_flush()
+
+
+def _timed_thumbnail(kind, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            store.observe('yatube_thumbnail_seconds', {'kind': kind},
+                          time.perf_counter() - started)
+            store.maybe_flush()
+    wrapper.metrics_hook = True
+    return wrapper
+
+
+_hooks_lock = threading.Lock()
+_hooks_installed = False
+
+
+def install_hooks():
+    """Count cache reads and time thumbnails and image variants. Done
+    once, on load of the middleware."""
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        from posts import images
+        from sorl.thumbnail.base import ThumbnailBackend
+        for backend in {type(caches[alias]) for alias in settings.CACHES}:
+            if not getattr(backend.get, 'metrics_hook', False):
+                backend.get = _counted_get(backend.get)
+        ThumbnailBackend.get_thumbnail = _timed_thumbnail(
+            'sorl', ThumbnailBackend.get_thumbnail)
+        images.variant_observers.append(_observe_variants)
+        _hooks_installed = True
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.METRICS_DIR:
+            raise MiddlewareNotUsed
+        install_hooks()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        store.observe('yatube_request_duration_seconds', {'view': view},
+                      duration)
+        store.observe('yatube_db_queries', {'view': view}, counter.count)
+        store.inc('yatube_responses_total',
+                  {'view': view, 'status': str(response.status_code)})
+        if request.method == 'POST' and request.content_type == (
+                'multipart/form-data'):
+            for field, upload in request.FILES.items():
+                store.observe('yatube_upload_bytes', {'field': field},
+                              upload.size)
+        store.maybe_flush()
+        return response
+
+
+class QueryCounter:
+    """Execute wrapper counting queries without logging them."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,276 @@
+"""Request instrumentation.
+
+ServerTimingMiddleware measures time spent in SQL queries, template
+rendering, cache calls and thumbnail generation for a sampled share
+of requests (REQUEST_TIMING_SAMPLE_RATE). Results are sent in the
+Server-Timing header and logged as a JSON line to 'yatube.timing'.
+With the rate 0 the middleware is not loaded at all.
+
+Timers of different kinds may overlap: template time includes queries
+and cache calls made while rendering.
+
+ProfilerMiddleware profiles requests with a valid signed
+X-Profile-Token header (see profile_token()), staff requests with
+?profile=1 and every PROFILE_SAMPLE_EVERY-th request. Profiles are
+written to PROFILE_DIR, named by the view, as collapsed stacks for
+flame graphs or as cProfile dumps (PROFILE_FORMAT).
+"""
+import cProfile
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('yatube.timing')
+
+CACHE_METHODS = ('get', 'set', 'add', 'delete',
+                 'get_many', 'set_many', 'delete_many')
+
+# Server-Timing metric: description.
+METRICS = {
+    'db': 'SQL',
+    'tpl': 'Templates',
+    'cache': 'Cache',
+    'thumb': 'Thumbnails',
+}
+
+_local = threading.local()
+_hooks_lock = threading.Lock()
+_hooks_installed = False
+
+
+class RequestTimer:
+    """Accumulated time and number of calls per metric."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.active = set()
+
+    def call(self, metric, func, *args, **kwargs):
+        if metric in self.active:
+            return func(*args, **kwargs)
+        self.active.add(metric)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.durations[metric] += time.perf_counter() - started
+            self.counts[metric] += 1
+            self.active.discard(metric)
+
+    def execute(self, execute, sql, params, many, context):
+        """Execute wrapper of database connections."""
+        return self.call('db', execute, sql, params, many, context)
+
+    def header(self, total):
+        metrics = [
+            f'{metric};desc="{description} ({self.counts[metric]})";'
+            f'dur={self.durations[metric] * 1000:.1f}'
+            for metric, description in METRICS.items()
+            if metric in self.counts
+        ]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def record(self):
+        record = {}
+        for metric in METRICS:
+            record[f'{metric}_ms'] = round(self.durations[metric] * 1000, 2)
+            record[f'{metric}_count'] = self.counts[metric]
+        return record
+
+
+def current_timer():
+    """Return timer of the request being measured in this thread."""
+    return getattr(_local, 'timer', None)
+
+
+def timed(metric, func):
+    """Wrap func to be measured as metric in sampled requests."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        timer = current_timer()
+        if timer is None:
+            return func(*args, **kwargs)
+        return timer.call(metric, func, *args, **kwargs)
+    wrapper.timed_metric = metric
+    return wrapper
+
+
+def install_hooks():
+    """Wrap template rendering, cache backends and sorl thumbnail
+    backend. Done once, on load of the middleware."""
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        from django.template.backends.django import Template
+        from sorl.thumbnail.base import ThumbnailBackend
+        targets = [(Template, 'render', 'tpl'),
+                   (ThumbnailBackend, 'get_thumbnail', 'thumb')]
+        for backend in {type(caches[alias]) for alias in settings.CACHES}:
+            targets.extend((backend, name, 'cache') for name in CACHE_METHODS)
+        for cls, name, metric in targets:
+            method = getattr(cls, name)
+            if getattr(method, 'timed_metric', None) is None:
+                setattr(cls, name, timed(metric, method))
+        _hooks_installed = True
+
+
+class ServerTimingMiddleware:
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        install_hooks()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        timer = RequestTimer()
+        _local.timer = timer
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timer.execute))
+                response = self.get_response(request)
+        finally:
+            _local.timer = None
+        total = time.perf_counter() - started
+        response['Server-Timing'] = timer.header(total)
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'time': round(time.time(), 3),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            **timer.record(),
+        }, separators=(',', ':')))
+        return response
+
+
+PROFILE_SALT = 'yatube.profile'
+
+
+def profile_token():
+    """Return value of X-Profile-Token header which enables profiling
+    of requests for PROFILE_TOKEN_MAX_AGE seconds."""
+    return signing.dumps('profile', salt=PROFILE_SALT)
+
+
+class StackSampler:
+    """Count stacks of a thread, sampled every interval seconds by
+    a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+    def write(self, path):
+        with open(path, 'w') as target:
+            for stack, count in self.stacks.most_common():
+                target.write(f'{stack} {count}\n')
+
+
+def _collapse(frame):
+    """Return stack of frame from the root as 'module:function;...'."""
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{frame.f_code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class ProfilerMiddleware:
+
+    def __init__(self, get_response):
+        self.directory = settings.PROFILE_DIR
+        if not self.directory:
+            raise MiddlewareNotUsed
+        os.makedirs(self.directory, exist_ok=True)
+        self.sample_every = settings.PROFILE_SAMPLE_EVERY
+        self.counter = itertools.count(1)
+        self.sequence = itertools.count(1)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested = self.is_requested(request)
+        if not requested and not self.is_sampled():
+            return self.get_response(request)
+        if settings.PROFILE_FORMAT == 'cprofile':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            path = self.path(request, 'prof')
+            profiler.dump_stats(path)
+        else:
+            with StackSampler(threading.get_ident(),
+                              settings.PROFILE_INTERVAL) as sampler:
+                response = self.get_response(request)
+            path = self.path(request, 'folded')
+            sampler.write(path)
+        if requested:
+            response['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    def is_requested(self, request):
+        token = request.META.get('HTTP_X_PROFILE_TOKEN')
+        if token:
+            try:
+                signing.loads(token, salt=PROFILE_SALT,
+                              max_age=settings.PROFILE_TOKEN_MAX_AGE)
+                return True
+            except signing.BadSignature:
+                pass
+        user = getattr(request, 'user', None)
+        return bool(request.GET.get('profile') and user is not None
+                    and user.is_staff)
+
+    def is_sampled(self):
+        return bool(self.sample_every
+                    and next(self.counter) % self.sample_every == 0)
+
+    def path(self, request, ext):
+        match = request.resolver_match
+        view = re.sub(r'[^\w.-]', '.', match.view_name if match else 'none')
+        name = (f'{time.strftime("%Y%m%d-%H%M%S")}-{view}-'
+                f'{os.getpid()}-{next(self.sequence)}.{ext}')
+        return os.path.join(self.directory, name)
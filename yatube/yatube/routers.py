@@ -0,0 +1,82 @@
+"""Read replicas.
+
+ReplicaRouter sends reads of GET requests to REPLICA_VIEWS to one of
+DATABASE_REPLICAS, everything else goes to the primary 'default'
+database. Replicas are copies of the primary (see sync_replicas
+command), so they lag behind it. To let users see their own writes,
+a write pins the rest of the request to the primary and sets a cookie
+which keeps reads of this user on the primary for
+REPLICA_STICKY_SECONDS. Sessions and users are always read from the
+primary, otherwise a user who has just signed up or logged in would
+look anonymous until the next sync.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'primary_until'
+PRIMARY_APPS = ('auth', 'contenttypes', 'sessions')
+
+_local = threading.local()
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if (getattr(_local, 'pinned', True)
+                or model._meta.app_label in PRIMARY_APPS):
+            return DEFAULT_DB_ALIAS
+        return _local.replica
+
+    def db_for_write(self, model, **hints):
+        _local.pinned = True
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.pinned = True
+        _local.wrote = False
+        try:
+            response = self.get_response(request)
+            if _local.wrote:
+                window = settings.REPLICA_STICKY_SECONDS
+                response.set_cookie(STICKY_COOKIE,
+                                    str(int(time.time() + window)),
+                                    max_age=window, httponly=True)
+            return response
+        finally:
+            _local.pinned = True
+            _local.wrote = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name in settings.REPLICA_VIEWS
+                and not is_sticky(request)):
+            _local.replica = random.choice(settings.DATABASE_REPLICAS)
+            _local.pinned = False
+
+
+def is_sticky(request):
+    """Return True if the user wrote recently."""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
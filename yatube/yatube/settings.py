@@ -37,13 +37,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yatube.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'yatube.middleware.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -73,10 +77,25 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite tuned for concurrent requests (yatube.sqlite): WAL lets reads
+# run during writes, connections are kept between requests
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 5,
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,
+                'mmap_size': 256 * 1024 * 1024,
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
         # 'TEST': {
         #     'NAME': os.path.join(BASE_DIR, 'mytestdatabase.sqlite3'),
         # },
@@ -84,6 +103,40 @@ DATABASES = {
 }
 
 
+# Listing views read from replicas, copies of 'default' made by
+# sync_replicas command (yatube.routers), e.g.
+# DATABASES['replica'] = {**DATABASES['default'],
+#                         'NAME': os.path.join(BASE_DIR, 'replica.sqlite3')}
+# DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+
+DATABASE_REPLICAS = []
+
+REPLICA_VIEWS = [
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post',
+    'posts:post_comments',
+    'posts:follow_index',
+    'posts:search',
+    'posts:api_index',
+    'posts:api_group_posts',
+    'posts:api_profile',
+    'posts:api_post',
+    'posts:api_follow_index',
+    'posts:posts_rss',
+    'posts:posts_atom',
+    'posts:group_rss',
+    'posts:group_atom',
+    'posts:author_rss',
+    'posts:author_atom',
+]
+
+# Reads of a user stay on 'default' for this time after a write
+REPLICA_STICKY_SECONDS = 10
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -138,11 +191,98 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'versions'),
+    },
 }
 
+# Content versions of cached pages (posts.caching), shared by all worker
+# processes; fragments themselves may stay in the per-process 'default'
+VERSION_CACHE = 'versions'
+
 POST_PER_PAGE = 10
 
+# Comments of a post are shown and loaded by 'load more' in chunks
+COMMENTS_PER_PAGE = 20
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
+
+TIMELINE_BATCH_SIZE = 500
+
+# 'page' - numbered pages, 'cursor' - keyset pagination by (pub_date, id)
+PAGINATION_MODE = 'page'
+
+# Post list fragments are invalidated by content versions (posts.caching)
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Post thumbnails are generated in background after save (posts.thumbnails)
+THUMBNAIL_PREGENERATE = True
+
+THUMBNAIL_WORKERS = 2
+
+# Responsive variants of post images (posts.images)
+POST_IMAGE_WIDTHS = (480, 768, 960)
+
+# Uploaded post images are downscaled to fit POST_IMAGE_MAX_SIZE
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+
+POST_IMAGE_MAX_DECODE_BYTES = 64 * 1024 * 1024
+
+# Admin changelists estimate row count of unfiltered bigger tables
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Share of requests with Server-Timing header and JSON log line
+# in 'yatube.timing' logger, 0 disables timing (yatube.middleware)
+REQUEST_TIMING_SAMPLE_RATE = 0
+
+# Profiles of requests are written to PROFILE_DIR, None disables
+# profiling (yatube.middleware)
+PROFILE_DIR = None
+
+# Profile every N-th request, 0 - only requested by staff ?profile=1
+# or signed X-Profile-Token header
+PROFILE_SAMPLE_EVERY = 0
+
+# 'collapsed' - sampled stacks for flame graphs, 'cprofile' - pstats dump
+PROFILE_FORMAT = 'collapsed'
+
+PROFILE_INTERVAL = 0.005
+
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+# Prometheus metrics of worker processes are shared through files
+# in METRICS_DIR, None disables metrics (yatube.metrics)
+METRICS_DIR = None
+
+METRICS_FLUSH_INTERVAL = 5
+
+# /metrics is shown to staff and to scrapers with header
+# 'Authorization: Bearer <METRICS_TOKEN>', None allows staff only
+METRICS_TOKEN = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'jsonl': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.timing': {
+            'handlers': ['jsonl'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
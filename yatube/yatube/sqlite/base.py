@@ -0,0 +1,30 @@
+"""SQLite backend which tunes every new connection.
+
+OPTIONS['pragmas'] are applied on connection, e.g. WAL journal mode,
+so readers don't block writers. OPTIONS['transaction_mode'] =
+'IMMEDIATE' starts atomic blocks with BEGIN IMMEDIATE: a writer waits
+for busy_timeout to get the write lock instead of failing with
+"database is locked" when its read transaction can't be upgraded.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()